@@ -0,0 +1,189 @@
+import time
+import utils.chinese
+import utils.text
+from random import random
+
+
+def random_gb2312_string(length):
+    """Return a random string of GB2312 level 1 characters, ASCII letters and punctuations.
+    """
+    chars = list()
+    while len(chars) < length:
+        if random() < 0.1:
+            chars.append('abcXYZ，。、'[int(random() * 9)])
+        else:
+            try:
+                chars.append(bytes((0xb0 + int(random() * 40), 0xa1 + int(random() * 94))).decode('gb2312'))
+            except UnicodeDecodeError:
+                pass
+    return ''.join(chars)
+
+
+def gb2312_pinyin_table():
+    """Return the table of the former gb2312_to_pinyin: (pinyin, first GB2312 code - 65536) of each pinyin in code
+    order, rebuilt with gb2312_to_pinyin.
+    """
+    table = list()
+    for byte1 in range(0xb0, 0xf8):
+        for byte2 in range(0xa1, 0xff):
+            try:
+                c = bytes((byte1, byte2)).decode('gb2312')
+            except UnicodeDecodeError:
+                continue
+            pinyin = utils.chinese.gb2312_to_pinyin(c)
+            if not table or table[-1][0] != pinyin:
+                table.append((pinyin, 256 * byte1 + byte2 - 256 * 256))
+    return tuple(table)
+
+
+def gb2312_to_pinyin_scan(s, acronym=False, table=gb2312_pinyin_table()):
+    """The former gb2312_to_pinyin, which encodes each character and scans the pinyin table backwards.
+    """
+    pinyin = list()
+    for c in s:
+        try:
+            bytes = c.encode('gb2312')
+        except UnicodeEncodeError:
+            value = 0
+        else:
+            if len(bytes) == 2:
+                value = 256 * bytes[0] + bytes[1] - 256 * 256
+            elif len(bytes) == 1:
+                value = bytes[0]
+            else:
+                value = 0
+        if value == 0:
+            pinyin.append('*')
+        elif 0 < value < 160:
+            pinyin.append(chr(value))
+        else:
+            for i in range(len(table) - 1, -1, -1):
+                if table[i][1] <= value:
+                    pinyin.append(table[i][0] if not acronym else table[i][0][:1])
+                    break
+    return ''.join(pinyin)
+
+
+def benchmark_gb2312_to_pinyin(length=1000000, line_length=100):
+    """Compare throughput of the table scan and the lookup index of gb2312_to_pinyin over a corpus.
+    """
+    corpus = random_gb2312_string(length)
+    lines = [corpus[i:i + line_length] for i in range(0, length, line_length)]
+    for function in (gb2312_to_pinyin_scan, utils.chinese.gb2312_to_pinyin):
+        elapsed_time = time.time()
+        for line in lines:
+            function(line)
+        elapsed_time = time.time() - elapsed_time
+        print('{0}: {1:.0f} chars/s'.format(function.__name__, length / elapsed_time))
+
+
+def benchmark_pinyin_converter(length=1000000, line_length=100):
+    """Compare throughput of per-character unicode_to_pinyin and phrase-aware PinyinConverter.
+    """
+    corpus = random_gb2312_string(length)
+    lines = [corpus[i:i + line_length] for i in range(0, length, line_length)]
+    converter = utils.chinese.PinyinConverter()
+    for name, function in (('unicode_to_pinyin', utils.chinese.unicode_to_pinyin),
+                           ('PinyinConverter.convert', converter.convert)):
+        elapsed_time = time.time()
+        for line in lines:
+            function(line)
+        elapsed_time = time.time() - elapsed_time
+        print('{0}: {1:.0f} chars/s'.format(name, length / elapsed_time))
+
+
+def benchmark_pinyin_index(sizes=(10000, 100000), queries=('zhangs', 'zs', 'li', 'wangx')):
+    """Compare PinyinIndex prefix search with a linear scan of converted full pinyin and acronyms.
+    """
+    for size in sizes:
+        names = [random_gb2312_string(2 + int(random() * 2)) for _ in range(size)]
+        elapsed_time = time.time()
+        index = utils.chinese.PinyinIndex(names)
+        print('PinyinIndex(size={0}): built in {1:.1f} s'.format(size, time.time() - elapsed_time))
+        converted = [(utils.chinese.gb2312_to_pinyin(name).lower(),
+                      utils.chinese.gb2312_to_pinyin(name, acronym=True).lower()) for name in names]
+        elapsed_time = time.time()
+        for query in queries:
+            index.search(query)
+        elapsed_time = time.time() - elapsed_time
+        print('PinyinIndex.search(size={0}): {1:.2f} ms/query'.format(size, elapsed_time / len(queries) * 1000))
+        elapsed_time = time.time()
+        for query in queries:
+            [name for name, (pinyin, acronym) in zip(names, converted)
+             if pinyin.startswith(query) or acronym.startswith(query)]
+        elapsed_time = time.time() - elapsed_time
+        print('Linear scan(size={0}): {1:.2f} ms/query'.format(size, elapsed_time / len(queries) * 1000))
+
+
+def benchmark_gb2312_to_pinyin_many(count=1000000, distinct_count=1000):
+    """Compare per-call gb2312_to_pinyin with gb2312_to_pinyin_many with and without a cache over repeated strings.
+    """
+    distinct_strings = [random_gb2312_string(2 + int(random() * 6)) for _ in range(distinct_count)]
+    strings = [distinct_strings[int(random() * distinct_count)] for _ in range(count)]
+    elapsed_time = time.time()
+    for s in strings:
+        utils.chinese.gb2312_to_pinyin(s)
+    elapsed_time = time.time() - elapsed_time
+    print('gb2312_to_pinyin: {0:.0f} strings/s'.format(count / elapsed_time))
+    for cache in (None, utils.chinese.PinyinCache()):
+        elapsed_time = time.time()
+        for _ in utils.chinese.gb2312_to_pinyin_many(strings, cache=cache):
+            pass
+        elapsed_time = time.time() - elapsed_time
+        print('gb2312_to_pinyin_many(cache={0}): {1:.0f} strings/s'.format(
+            cache.cache_info() if cache is not None else None, count / elapsed_time))
+
+
+def benchmark_simplified_traditional_converter(length=5000000):
+    """Compare throughput of the former per-character loop and convert on multi-MB documents in both directions.
+    """
+    converter = utils.chinese.SimplifiedTraditionalConverter()
+    for simplified_to_traditional in (True, False):
+        converter.simplified_to_traditional = simplified_to_traditional
+        d = converter.simplified_to_traditional_dict if simplified_to_traditional else \
+            converter.traditional_to_simplified_dict
+        chars = list(d) + list('的一是不了人我在有他这为之大来以个中上们到说国和地也子时道出而要于就下得可你年生，。')
+        document = ''.join(chars[int(random() * len(chars))] for _ in range(length))
+        elapsed_time = time.time()
+        r = list()
+        for c in document:
+            r.append(d[c] if c in d else c)
+        ''.join(r)
+        elapsed_time = time.time() - elapsed_time
+        print('Loop(simplified_to_traditional={0}): {1:.1f} MB/s'.format(
+            simplified_to_traditional, len(document.encode('utf-8')) / elapsed_time / 1e6))
+        converter.convert('')
+        elapsed_time = time.time()
+        converter.convert(document)
+        elapsed_time = time.time() - elapsed_time
+        print('convert(simplified_to_traditional={0}): {1:.1f} MB/s'.format(
+            simplified_to_traditional, len(document.encode('utf-8')) / elapsed_time / 1e6))
+
+
+def benchmark_prc_id_validate_many(count=1000000):
+    """Compare per-ID prc_id_checksum with vectorized prc_id_validate_many.
+    """
+    ids = list()
+    for _ in range(count):
+        id_num = '{0:06d}{1:04d}{2:02d}{3:02d}{4:03d}'.format(int(random() * 1000000), 1950 + int(random() * 60),
+                                                              1 + int(random() * 12), 1 + int(random() * 28),
+                                                              int(random() * 1000))
+        ids.append(id_num + utils.chinese.prc_id_checksum(id_num))
+    elapsed_time = time.time()
+    [utils.chinese.prc_id_checksum(id_num) == id_num[17] for id_num in ids]
+    elapsed_time = time.time() - elapsed_time
+    print('prc_id_checksum: {0:.0f} IDs/s'.format(count / elapsed_time))
+    elapsed_time = time.time()
+    utils.chinese.prc_id_validate_many(ids)
+    elapsed_time = time.time() - elapsed_time
+    print('prc_id_validate_many(numpy={0}): {1:.0f} IDs/s'.format(utils.text._numpy() is not None,
+                                                                  count / elapsed_time))
+
+
+if __name__ == '__main__':
+    benchmark_gb2312_to_pinyin()
+    benchmark_pinyin_converter()
+    benchmark_pinyin_index()
+    benchmark_gb2312_to_pinyin_many()
+    benchmark_simplified_traditional_converter()
+    benchmark_prc_id_validate_many()
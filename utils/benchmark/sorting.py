@@ -0,0 +1,109 @@
+import time
+import utils.sorting
+from random import random
+
+
+def benchmark_key(length=100000, sorts=(utils.sorting.heapsort, utils.sorting.quicksort, utils.sorting.merge_sort)):
+    """Compare sorting records by a derived key with a compare function, with key and by native < of the keys.
+    """
+    records = [{'name': 'user{0}'.format(i), 'score': int(random() * length)} for i in range(length)]
+
+    def derived_key(record):
+        return record['score'] * 2 + len(record['name'])
+
+    def compare(record1, record2):
+        key1, key2 = derived_key(record1), derived_key(record2)
+        return 0 if key1 == key2 else (-1 if key1 < key2 else 1)
+
+    for sort in sorts:
+        for name, arguments in (('compare', {'compare': compare}), ('key', {'key': derived_key})):
+            datas = records[:]
+            elapsed_time = time.time()
+            sort(datas, **arguments)
+            print('{0}({1}, length={2}): {3:.2f} s'.format(sort.__name__, name, length, time.time() - elapsed_time))
+        datas = [derived_key(record) for record in records]
+        elapsed_time = time.time()
+        sort(datas)
+        print('{0}(<, length={1}): {2:.2f} s'.format(sort.__name__, length, time.time() - elapsed_time))
+
+
+def benchmark_key_duplicates(length=100000, sorts=(utils.sorting.quicksort, utils.sorting.heapsort)):
+    """Compare sorting by keys made unique with the index, as all sorts by key did, and by the keys, as unstable sorts
+    by key do, on random and few distinct keys.
+    """
+    inputs = (('random', [random() for _ in range(length)]),
+              ('10 distinct', [int(random() * 10) for _ in range(length)]))
+    for sort in sorts:
+        for name, keys in inputs:
+            for key_name, key in (('(key, index)', lambda i: (keys[i], i)), ('key', keys.__getitem__)):
+                datas = list(range(length))
+                elapsed_time = time.time()
+                sort(datas, key=key)
+                print('{0}({1}, {2}, length={3}): {4:.3f} s'.format(sort.__name__, name, key_name, length,
+                                                                    time.time() - elapsed_time))
+
+
+def benchmark_nearly_sorted(length=100000, sorts=(utils.sorting.merge_sort, utils.sorting.timsort, sorted)):
+    """Compare sorts on random, sorted, reversed and nearly sorted data with 1% of the elements swapped.
+    """
+    datas = sorted(random() for _ in range(length))
+    nearly_sorted = datas[:]
+    for _ in range(length // 100):
+        i, j = int(random() * length), int(random() * length)
+        nearly_sorted[i], nearly_sorted[j] = nearly_sorted[j], nearly_sorted[i]
+    inputs = (('random', [random() for _ in range(length)]), ('sorted', datas), ('reversed', datas[::-1]),
+              ('nearly sorted', nearly_sorted))
+    for sort in sorts:
+        for name, source in inputs:
+            datas = source[:]
+            elapsed_time = time.time()
+            sort(datas)
+            print('{0}({1}, length={2}): {3:.3f} s'.format(sort.__name__, name, length, time.time() - elapsed_time))
+
+
+def quicksort_random_pivot(datas):
+    """The former quicksort, which partitions two-way around a random pivot.
+    """
+    if len(datas) <= 1:
+        return
+    stack = list()
+    stack.append((0, len(datas) - 1))
+    while len(stack) > 0:
+        left, right = stack.pop()
+        pivot = left + int(random() * (right - left + 1))
+        i, j, data = left, right, datas[pivot]
+        while i < j:
+            while j > pivot and not datas[j] < data:
+                j -= 1
+            if j > pivot:
+                datas[pivot], pivot = datas[j], j
+            while i < pivot and not data < datas[i]:
+                i += 1
+            if i < pivot:
+                datas[pivot], pivot = datas[i], i
+        datas[pivot] = data
+        if left < pivot - 1:
+            stack.append((left, pivot - 1))
+        if pivot + 1 < right:
+            stack.append((pivot + 1, right))
+
+
+def benchmark_quicksort(length=20000, sorts=(quicksort_random_pivot, utils.sorting.quicksort, utils.sorting.heapsort)):
+    """Compare quicksorts and heapsort on random, adversarial, few distinct and all equal data.
+    """
+    inputs = (('random', [random() for _ in range(length)]),
+              ('adversarial', utils.sorting.adversarial_input(length)),
+              ('10 distinct', [int(random() * 10) for _ in range(length)]), ('equal', [0] * length))
+    for sort in sorts:
+        for name, source in inputs:
+            datas = source[:]
+            elapsed_time = time.time()
+            sort(datas)
+            print('{0}({1}, length={2}): {3:.3f} s'.format(sort.__name__, name, length, time.time() - elapsed_time))
+
+
+if __name__ == '__main__':
+    benchmark_key()
+    benchmark_key_duplicates()
+    benchmark_nearly_sorted()
+    benchmark_quicksort()
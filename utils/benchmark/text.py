@@ -0,0 +1,182 @@
+import time
+import tracemalloc
+import utils.text
+from random import random
+
+
+def random_string(alphabet, length):
+    return ''.join(alphabet[int(random() * len(alphabet))] for _ in range(length))
+
+
+def benchmark_check_many(keywords_count=20000, strings_count=20000, workers=4, chunk_size=1000):
+    """Compare throughput of per-call contains_keywords and batched check_many.
+    """
+    alphabet = '的一是不了人我在有他这为之大来以个中上们到说国和地也子时道出而要于就下得可你年生'
+    keywords = [random_string(alphabet, 3 + int(random() * 4)) for _ in range(keywords_count)]
+    strings = [random_string(alphabet, 200) for _ in range(strings_count)]
+    checker = utils.text.KeywordsChecker(keywords, aho_corasick=True)
+    elapsed_time = time.time()
+    for string in strings:
+        checker.contains_keywords(string)
+    elapsed_time = time.time() - elapsed_time
+    print('contains_keywords: {0:.0f} strings/s'.format(strings_count / elapsed_time))
+    elapsed_time = time.time()
+    for _ in checker.check_many(strings, workers=workers, chunk_size=chunk_size):
+        pass
+    elapsed_time = time.time() - elapsed_time
+    print('check_many({0} workers): {1:.0f} strings/s'.format(workers, strings_count / elapsed_time))
+
+
+def benchmark_compact_memory(keywords_count=200000):
+    """Compare memory taken by dict based and compact keywords checkers.
+    """
+    alphabet = '的一是不了人我在有他这为之大来以个中上们到说国和地也子时道出而要于就下得可你年生'
+    keywords = [random_string(alphabet, 2 + int(random() * 5)) for _ in range(keywords_count)]
+    for name, options in (('trie', {}), ('aho_corasick', {'aho_corasick': True}), ('compact', {'compact': True})):
+        tracemalloc.start()
+        checker = utils.text.KeywordsChecker(keywords, **options)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print('{0}: {1:.1f} MB'.format(name, size / 1024 / 1024))
+        checker = None
+
+
+def find_keywords_skipping(checker, string, maximum_match=False):
+    """The former trie based find_keywords, which skips punctuations to trim during the walk from every position.
+    """
+    keywords_trie, skipped_chars, length, position = checker.keywords_trie, checker.punctuations_to_trim, len(string), 0
+    while position < length:
+        if string[position] in skipped_chars:
+            position += 1
+            continue
+        current_node, matching_end = keywords_trie, 0
+        for end in range(position, length):
+            char = string[end]
+            if char in skipped_chars:
+                continue
+            if char not in current_node:
+                break
+            current_node = current_node[char]
+            if current_node[utils.text.KeywordsChecker.END_OF_KEYWORD]:
+                matching_end = end + 1
+                if not maximum_match:
+                    break
+        if matching_end == 0:
+            position += 1
+        else:
+            keyword = ''.join([char for char in string[position: matching_end] if char not in skipped_chars])
+            yield position, matching_end, keyword
+            position = matching_end
+
+
+def benchmark_find_keywords(keywords_count=200000, length=200000, long_keyword_length=3000):
+    """Compare the former find_keywords skipping punctuations during the walk with get_contained_keywords and
+    find_keywords, which remove punctuations in one pass, on text with punctuations and on a long keyword prefix.
+    """
+    alphabet = '的一是不了人我在有他这为之大来以个中上们到说国和地也子时道出而要于就下得可你年生'
+    keywords = [random_string(alphabet, 2 + int(random() * 5)) for _ in range(keywords_count)]
+    inputs = (('text', utils.text.KeywordsChecker(keywords), random_string(alphabet + '，。 ', length)),
+              ('long prefix', utils.text.KeywordsChecker(['a' * long_keyword_length + 'b']), 'a' * long_keyword_length))
+    for name, checker, string in inputs:
+        for function_name, function in (
+                ('Former find_keywords', lambda: list(find_keywords_skipping(checker, string))),
+                ('get_contained_keywords', lambda: checker.get_contained_keywords(string)),
+                ('find_keywords', lambda: list(checker.find_keywords(string)))):
+            elapsed_time = time.time()
+            function()
+            print('{0}({1}, length={2}): {3:.3f} s'.format(function_name, name, len(string), time.time() - elapsed_time))
+
+
+def benchmark_get_contained_keywords(keywords_count=200000, length=200000, long_keyword_length=3000):
+    """Compare the trie walk and the Aho-Corasick automaton of get_contained_keywords on text dense and sparse with
+    matches and on a long keyword prefix, with contains_keywords for reference.
+    """
+    alphabet = '的一是不了人我在有他这为之大来以个中上们到说国和地也子时道出而要于就下得可你年生'
+    keywords = [random_string(alphabet, 2 + int(random() * 5)) for _ in range(keywords_count)]
+    long_keywords = ['a' * long_keyword_length + 'b']
+    inputs = (('dense', keywords, random_string(alphabet + '，。 ', length)),
+              ('sparse', keywords, random_string(alphabet + 'abcdefghijklmnopqrstuvwxyz' * 3 + '，。 ', length)),
+              ('long prefix', long_keywords, 'a' * long_keyword_length))
+    for name, keywords, string in inputs:
+        for aho_corasick in (False, True):
+            checker = utils.text.KeywordsChecker(keywords, aho_corasick=aho_corasick)
+            for maximum_match in (False, True):
+                elapsed_time = time.time()
+                checker.get_contained_keywords(string, maximum_match)
+                print('get_contained_keywords({0}, aho_corasick={1}, maximum_match={2}): {3:.3f} s'.format(
+                    name, aho_corasick, maximum_match, time.time() - elapsed_time))
+            elapsed_time = time.time()
+            checker.contains_keywords(string)
+            print('contains_keywords({0}, aho_corasick={1}): {2:.3f} s'.format(name, aho_corasick,
+                                                                               time.time() - elapsed_time))
+
+
+def benchmark_edit_distance(lengths=(4, 8, 16, 32, 64, 128), repeat=2000):
+    """Compare the dynamic programming and the bit-parallel edit distance, and the Damerau distance.
+    """
+    for length in lengths:
+        pairs = [(random_string('abcdefgh', length), random_string('abcdefgh', length)) for _ in range(repeat)]
+        for function in (utils.text.edit_distance_dp, utils.text.edit_distance_bit_parallel,
+                         utils.text.damerau_distance):
+            elapsed_time = time.time()
+            for s1, s2 in pairs:
+                function(s1, s2)
+            elapsed_time = time.time() - elapsed_time
+            print('{0}(length={1}): {2:.0f} calls/s'.format(function.__name__, length, repeat / elapsed_time))
+            elapsed_time = time.time()
+            for s1, s2 in pairs:
+                function(s1, s2, max_distance=2)
+            elapsed_time = time.time() - elapsed_time
+            print('{0}(length={1}, max_distance=2): {2:.0f} calls/s'.format(function.__name__, length,
+                                                                             repeat / elapsed_time))
+
+
+def benchmark_bk_tree(sizes=(10000, 100000, 1000000), queries_count=100, max_distance=1):
+    """Compare BK-tree build and query time with a linear scan at several dictionary sizes.
+    """
+    alphabet = 'abcdefghijklmnopqrstuvwxyz'
+    for size in sizes:
+        strings = [random_string(alphabet, 5 + int(random() * 8)) for _ in range(size)]
+        queries = [random_string(alphabet, 5 + int(random() * 8)) for _ in range(queries_count)]
+        elapsed_time = time.time()
+        tree = utils.text.BKTree(strings)
+        print('BKTree(size={0}): built in {1:.1f} s'.format(size, time.time() - elapsed_time))
+        elapsed_time = time.time()
+        for query in queries:
+            tree.search(query, max_distance)
+        elapsed_time = time.time() - elapsed_time
+        print('BKTree.search(size={0}): {1:.1f} ms/query'.format(size, elapsed_time / queries_count * 1000))
+        elapsed_time = time.time()
+        for query in queries:
+            tree.nearest(query, 5)
+        elapsed_time = time.time() - elapsed_time
+        print('BKTree.nearest(size={0}): {1:.1f} ms/query'.format(size, elapsed_time / queries_count * 1000))
+        elapsed_time = time.time()
+        for query in queries[:10]:
+            [string for string in strings if utils.text.edit_distance(query, string, max_distance) <= max_distance]
+        elapsed_time = time.time() - elapsed_time
+        print('Linear scan(size={0}): {1:.1f} ms/query'.format(size, elapsed_time / 10 * 1000))
+
+
+def benchmark_edit_distance_matrix(size=2000, length=12, workers=4):
+    """Compare nested edit_distance calls with edit_distance_matrix, in process and in a process pool.
+    """
+    strings = [random_string('abcdefghijklmnopqrstuvwxyz', length) for _ in range(size)]
+    elapsed_time = time.time()
+    [[utils.text.edit_distance(s1, s2) for s2 in strings] for s1 in strings]
+    print('Nested edit_distance(size={0}): {1:.1f} s'.format(size, time.time() - elapsed_time))
+    for workers in (1, workers):
+        elapsed_time = time.time()
+        utils.text.edit_distance_matrix(strings, strings, workers=workers, tile_size=500)
+        print('edit_distance_matrix(size={0}, workers={1}, numpy={2}): {3:.1f} s'.format(
+            size, workers, utils.text._numpy() is not None, time.time() - elapsed_time))
+
+
+if __name__ == '__main__':
+    benchmark_check_many()
+    benchmark_compact_memory()
+    benchmark_find_keywords()
+    benchmark_get_contained_keywords()
+    benchmark_edit_distance()
+    benchmark_bk_tree()
+    benchmark_edit_distance_matrix()
@@ -1,3 +1,17 @@
+from array import array
+from bisect import bisect_right
+from mmap import ACCESS_READ, mmap as memory_map
+import collections
+import csv
+import functools
+import multiprocessing
+import os
+import re
+import struct
+import sys
+import unicodedata
+import utils.text
+
 #
 # GB2312 to Pinyin
 #
@@ -84,36 +98,524 @@ __PINYIN = (('A', -20319), ('Ai', -20317), ('An', -20304), ('Ang', -20295), ('Ao
             ('Zuo', -10254))
 
 
+# Pinyin and acronyms of characters, built from __PINYIN on first use, see __pinyin_index.
+__PINYIN_INDEX = None
+
+
 def gb2312_to_pinyin(s, acronym=False):
     """Convert a Chinese GB2312 string to pinyin.
     """
+    index = __pinyin_index()[1 if acronym else 0]
+    return ''.join([index.get(c, '*') for c in s])
+
+
+def gb2312_to_pinyin_many(strings, acronym=False, cache=None):
+    """Yield pinyin of each string in order, see gb2312_to_pinyin.
+
+    If cache is a PinyinCache, results of repeated strings are taken from it.
+    """
+    if cache is not None:
+        for s in strings:
+            yield cache.gb2312_to_pinyin(s, acronym)
+        return
+    index = __pinyin_index()[1 if acronym else 0]
+    for s in strings:
+        yield ''.join([index.get(c, '*') for c in s])
+
+
+def gb2312_to_pinyin_csv(source, destination, columns, acronym=False, cache=None, encoding='utf-8', **fmtparams):
+    """Convert the columns of a CSV file to pinyin and write the rows to another file, one row at a time.
+
+    columns are indexes or names of the columns, names are looked up in the first row, which is written unchanged.
+    cache is the same as gb2312_to_pinyin_many, and fmtparams are passed to csv.reader and csv.writer.
+    """
+    with open(source, newline='', encoding=encoding) as source_file, \
+            open(destination, 'w', newline='', encoding=encoding) as destination_file:
+        reader, writer = csv.reader(source_file, **fmtparams), csv.writer(destination_file, **fmtparams)
+        if any(isinstance(column, str) for column in columns):
+            header = next(reader, None)
+            if header is None:
+                return
+            writer.writerow(header)
+            columns = [header.index(column) if isinstance(column, str) else column for column in columns]
+        convert = cache.gb2312_to_pinyin if cache is not None else gb2312_to_pinyin
+        for row in reader:
+            for column in columns:
+                if column < len(row):
+                    row[column] = convert(row[column], acronym)
+            writer.writerow(row)
+
+
+class PinyinCache:
+    """Bounded LRU cache of gb2312_to_pinyin results of whole strings, for data with many repeated strings.
+    """
+
+    def __init__(self, maxsize=65536):
+        self.gb2312_to_pinyin = functools.lru_cache(maxsize=maxsize)(gb2312_to_pinyin)
+
+    def cache_info(self):
+        """Return (hits, misses, maxsize, currsize) of the cache, see functools.lru_cache.
+        """
+        return self.gb2312_to_pinyin.cache_info()
+
+    def cache_clear(self):
+        self.gb2312_to_pinyin.cache_clear()
+
+
+def __pinyin_index():
+    """Return dicts from characters to pinyin and to acronyms, for all ASCII and GB2312 characters except NUL.
+
+    Pinyin of a GB2312 character is the last one in __PINYIN whose value is no greater than the character's value
+    (2-byte code - 65536), or an empty string if there is none.
+    """
+    global __PINYIN_INDEX
+    if __PINYIN_INDEX is None:
+        values = [value for _, value in __PINYIN]
+        pinyin = {chr(i): chr(i) for i in range(1, 128)}
+        for byte1 in range(0xa1, 0xf8):
+            for byte2 in range(0xa1, 0xff):
+                try:
+                    c = bytes((byte1, byte2)).decode('gb2312')
+                except UnicodeDecodeError:
+                    continue
+                i = bisect_right(values, 256 * byte1 + byte2 - 256 * 256) - 1
+                pinyin[c] = __PINYIN[i][0] if i >= 0 else ''
+        __PINYIN_INDEX = pinyin, {c: p[:1] for c, p in pinyin.items()}
+    return __PINYIN_INDEX
+
+
+#
+# Unicode to Pinyin
+#
+
+# The pinyin table of unicode_to_pinyin, loaded on first use, see pinyin_table.
+PINYIN_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pinyin.dat')
+_pinyin_table = None
+
+# Tone numbers of the combining tone marks.
+_TONE_MARKS = {'\u0304': '1', '\u0301': '2', '\u030c': '3', '\u0300': '4'}
+
+
+class PinyinTable:
+    """Packed table of pinyin readings of characters.
+
+    Readings are in lower case with tone numbers 1 to 4 (no number for the neutral tone) and 'v' for 'ü', e.g. 'lv4'.
+    Characters are grouped in ranges of consecutive code points, and each code point in a range keeps a 2-byte index of
+    its sequence of readings, so a table of all CJK unified ideographs takes a few hundred KB and can be memory-mapped.
+    """
+    FILE_MAGIC, FILE_VERSION, FILE_HEADER = b'PYTB', 1, struct.Struct('<4sIII')
+    # Code points without readings that are kept in a range instead of starting a new range.
+    MAX_GAP = 256
+
+    def __init__(self, readings):
+        """Build a table from a dict from characters to sequences of readings, with tone marks (as Unihan kMandarin)
+        or tone numbers.
+        """
+        self.path, self.readings, self.starts, self.ends, self.indexes = None, [()], list(), list(), list()
+        readings_indexes = {(): 0}
+        for c in sorted(readings, key=ord):
+            code_point = ord(c)
+            if not self.ends or code_point >= self.ends[-1] + PinyinTable.MAX_GAP:
+                self.starts.append(code_point)
+                self.ends.append(code_point)
+                self.indexes.append(array('H'))
+            c_readings = tuple(_numbered_pinyin(reading) for reading in readings[c])
+            if c_readings not in readings_indexes:
+                readings_indexes[c_readings] = len(self.readings)
+                self.readings.append(c_readings)
+            self.indexes[-1].extend(0 for _ in range(code_point - self.ends[-1]))
+            self.indexes[-1].append(readings_indexes[c_readings])
+            self.ends[-1] = code_point + 1
+        if len(self.readings) > 65536:
+            raise ValueError('Too many different readings: {0}'.format(len(self.readings)))
+
+    def get(self, c):
+        """Return the tuple of readings of a character, the first one is the most common, or () if there is none.
+        """
+        code_point = ord(c)
+        i = bisect_right(self.starts, code_point) - 1
+        if i < 0 or code_point >= self.ends[i]:
+            return ()
+        return self.readings[self.indexes[i][code_point - self.starts[i]]]
+
+    def save(self, path):
+        """Save the table to a binary file, which can be loaded quickly with load.
+        """
+        readings = '\n'.join(','.join(c_readings) for c_readings in self.readings).encode('ascii')
+        with open(path, 'wb') as file:
+            file.write(PinyinTable.FILE_HEADER.pack(PinyinTable.FILE_MAGIC, PinyinTable.FILE_VERSION,
+                                                    len(readings), len(self.starts)))
+            file.write(readings + bytes(-len(readings) % 4))
+            file.write(struct.pack('<{0}I'.format(2 * len(self.starts)),
+                                   *[x for range_ in zip(self.starts, self.ends) for x in range_]))
+            for indexes in self.indexes:
+                if sys.byteorder == 'big':
+                    indexes = array('H', indexes)
+                    indexes.byteswap()
+                file.write(indexes.tobytes())
+
+    @staticmethod
+    def load(path, mmap=True):
+        """Load a table saved by save.
+
+        If mmap is True, the indexes are memory-mapped instead of copied, so that only the pages used are read.
+        """
+        mmap = mmap and sys.byteorder == 'little'
+        with open(path, 'rb') as file:
+            buffer = memoryview(memory_map(file.fileno(), 0, access=ACCESS_READ) if mmap else file.read())
+        if len(buffer) < PinyinTable.FILE_HEADER.size:
+            raise ValueError('Not a pinyin table file: {0}'.format(path))
+        magic, version, readings_length, ranges_count = PinyinTable.FILE_HEADER.unpack_from(buffer)
+        if magic != PinyinTable.FILE_MAGIC:
+            raise ValueError('Not a pinyin table file: {0}'.format(path))
+        if version != PinyinTable.FILE_VERSION:
+            raise ValueError('Unsupported pinyin table file version {0}: {1}'.format(version, path))
+        table = PinyinTable.__new__(PinyinTable)
+        table.path = path if mmap else None
+        offset = PinyinTable.FILE_HEADER.size
+        readings = bytes(buffer[offset: offset + readings_length]).decode('ascii')
+        table.readings = [tuple(c_readings.split(',')) if c_readings else () for c_readings in readings.split('\n')]
+        offset += readings_length + (-readings_length % 4)
+        ranges = struct.unpack_from('<{0}I'.format(2 * ranges_count), buffer, offset)
+        table.starts, table.ends, table.indexes = list(ranges[0::2]), list(ranges[1::2]), list()
+        offset += ranges_count * 8
+        for start, end in zip(table.starts, table.ends):
+            indexes = buffer[offset: offset + (end - start) * 2]
+            if mmap:
+                indexes = indexes.cast('H')
+            else:
+                indexes = array('H', bytes(indexes))
+                if sys.byteorder == 'big':
+                    indexes.byteswap()
+            table.indexes.append(indexes)
+            offset += (end - start) * 2
+        if len(buffer) != offset:
+            raise ValueError('Truncated pinyin table file: {0}'.format(path))
+        return table
+
+
+def pinyin_table():
+    """Return the pinyin table at PINYIN_TABLE_PATH, which is loaded on first use.
+    """
+    global _pinyin_table
+    if _pinyin_table is None:
+        _pinyin_table = PinyinTable.load(PINYIN_TABLE_PATH)
+    return _pinyin_table
+
+
+def pinyin_readings(c):
+    """Return the tuple of readings of a character in the pinyin table, see PinyinTable.
+    """
+    return pinyin_table().get(c)
+
+
+# Pinyin and acronyms of the characters converted by unicode_to_pinyin so far.
+__UNICODE_PINYIN_INDEX = {chr(i): chr(i) for i in range(128)}, {chr(i): chr(i) for i in range(128)}
+
+
+def unicode_to_pinyin(s, acronym=False):
+    """Convert a Chinese string to pinyin, e.g. 'ZhouHongYi' for '周鸿祎'.
+
+    Unlike gb2312_to_pinyin, all characters in the pinyin table are converted by their most common readings. Other
+    characters are kept as they are. The table covers nearly all of the CJK unified ideographs block (U+4E00-9FFF) and
+    88% of extension A, but only 34% of extension B, under 6% of each of extensions C to H, and none of extension I
+    (U+2EBF0-2EE5F). See utils/make_pinyin_table.py to regenerate it.
+    """
+    index, table = __UNICODE_PINYIN_INDEX[1 if acronym else 0], None
     pinyin = list()
     for c in s:
-        # Encode a character.
-        try:
-            bytes = c.encode('gb2312')
-        except:
-            value = 0
-        else:
-            if len(bytes) == 2:
-                value = 256 * bytes[0] + bytes[1] - 256 * 256
-            elif len(bytes) == 1:
-                value = bytes[0]
+        p = index.get(c)
+        if p is None:
+            table = table or pinyin_table()
+            readings = table.get(c)
+            if not readings:
+                p = c
             else:
-                value = 0
-        # Get pinyin for the character.
-        if value == 0:
-            pinyin.append('*')
-        elif 0 < value < 160:
-            pinyin.append(chr(value))
-        else:
-            for i in range(len(__PINYIN) - 1, -1, -1):
-                if __PINYIN[i][1] <= value:
-                    pinyin.append(__PINYIN[i][0] if not acronym else __PINYIN[i][0][:1])
-                    break
+                p = index[c] = _toneless_pinyin(readings[0])[:1 if acronym else None]
+        pinyin.append(p)
     return ''.join(pinyin)
 
 
+def _numbered_pinyin(reading):
+    """Convert a reading with a tone mark or a tone number to lower case with a tone number, e.g. 'lv4' for 'lǜ'.
+    """
+    tone, chars = '', list()
+    for c in unicodedata.normalize('NFD', reading.strip().lower()):
+        if c in _TONE_MARKS:
+            tone = _TONE_MARKS[c]
+        elif c == '\u0308':
+            # 'ü' is decomposed to 'u' and the diaeresis.
+            chars[-1] = 'v'
+        elif c in '12345':
+            tone = c if c != '5' else ''
+        elif not unicodedata.combining(c):
+            chars.append(c)
+    return ''.join(chars) + tone
+
+
+def _toneless_pinyin(reading):
+    """Convert a reading of PinyinTable to capitalized pinyin without the tone as gb2312_to_pinyin, e.g. 'Lue' for
+    'lve4'.
+    """
+    reading = reading.rstrip('1234').replace('ve', 'ue')
+    return reading[:1].upper() + reading[1:]
+
+
+def _marked_pinyin(reading):
+    """Convert a reading of PinyinTable to capitalized pinyin with the tone mark, e.g. 'Lüè' for 'lve4'.
+    """
+    tone, reading = reading[-1:], reading.rstrip('1234').replace('v', 'ü')
+    if tone in '1234':
+        # The mark is on a or e, on o of ou, otherwise on the last vowel, or on m or n of a syllable without vowels.
+        if 'a' in reading or 'e' in reading:
+            position = max(reading.find('a'), reading.find('e'))
+        elif 'ou' in reading:
+            position = reading.find('o')
+        else:
+            position = max(0, max(reading.rfind(vowel) for vowel in 'iouü'))
+        mark = [mark for mark, number in _TONE_MARKS.items() if number == tone][0]
+        reading = unicodedata.normalize('NFC', reading[:position + 1] + mark + reading[position + 1:])
+    return reading[:1].upper() + reading[1:]
+
+
+class PinyinConverter:
+    """Convert Chinese strings to pinyin, choosing readings of polyphonic characters by the phrases they are in.
+
+    Phrases are matched by longest match from left to right in one pass, walking the keywords trie of a KeywordsChecker
+    only from the characters that begin phrases, and other characters are converted by their most common readings in
+    the pinyin table, see unicode_to_pinyin.
+    """
+    # Readings of common phrases with polyphonic characters, one phrase per line.
+    phrases = """重庆 chong2 qing4
+重新 chong2 xin1
+重复 chong2 fu4
+重阳 chong2 yang2
+银行 yin2 hang2
+行业 hang2 ye4
+行长 hang2 zhang3
+行情 hang2 qing2
+行列 hang2 lie4
+长大 zhang3 da4
+成长 cheng2 zhang3
+校长 xiao4 zhang3
+长城 chang2 cheng2
+长江 chang2 jiang1
+长度 chang2 du4
+音乐 yin1 yue4
+乐器 yue4 qi4
+还是 hai2 shi4
+还有 hai2 you3
+还款 huan2 kuan3
+归还 gui1 huan2
+朝阳 zhao1 yang2
+今朝 jin1 zhao1
+睡觉 shui4 jiao4
+午觉 wu3 jiao4
+了解 liao3 jie3
+为了 wei4 le
+的确 di2 que4
+目的 mu4 di4
+觉得 jue2 de
+得到 de2 dao4
+都市 du1 shi4
+首都 shou3 du1
+便宜 pian2 yi2
+差不多 cha4 bu4 duo1
+出差 chu1 chai1
+参差 cen1 ci1
+传记 zhuan4 ji4
+单于 chan2 yu2
+种地 zhong4 di4
+调查 diao4 cha2
+调整 tiao2 zheng3
+西藏 xi1 zang4
+宝藏 bao3 zang4
+处理 chu3 li3
+教书 jiao1 shu1
+头发 tou2 fa4
+理发 li3 fa4
+干净 gan1 jing4
+爱好 ai4 hao4
+会计 kuai4 ji4
+几乎 ji1 hu1
+假期 jia4 qi1
+投降 tou2 xiang2
+将军 jiang1 jun1
+空闲 kong4 xian2
+积累 ji1 lei3
+数量 shu4 liang4
+商量 shang1 liang2
+效率 xiao4 lv4
+率领 shuai4 ling3
+没有 mei2 you3
+灾难 zai1 nan4
+勉强 mian3 qiang3
+省略 sheng3 lve4
+反省 fan3 xing3
+数学 shu4 xue2
+数一数 shu3 yi1 shu3
+似的 shi4 de
+相声 xiang4 sheng1
+学校 xue2 xiao4
+高兴 gao1 xing4
+应该 ying1 gai1
+答应 da1 ying5
+参与 can1 yu4
+记载 ji4 zai3
+中奖 zhong4 jiang3
+着急 zhao2 ji2
+看着 kan4 zhe
+"""
+
+    def __init__(self, phrases=None, tone=None):
+        """Create a converter with a dict from phrases to sequences of readings, with tone marks or tone numbers (see
+        PinyinTable), which are added to the built-in phrases.
+
+        Pinyin is capitalized and without tones if tone is None, with tone numbers if tone is 'number' (e.g. 'Lv4'), or
+        with tone marks if tone is 'mark' (e.g. 'Lǜ').
+        """
+        if tone not in (None, 'number', 'mark'):
+            raise ValueError('Unsupported tone: {0}'.format(tone))
+        self.tone = tone
+        self.phrases = dict()
+        for line in PinyinConverter.phrases.splitlines():
+            phrase, *readings = line.split()
+            self.phrases[phrase] = tuple(self.__format(_numbered_pinyin(reading)) for reading in readings)
+        for phrase, readings in (phrases or dict()).items():
+            if len(readings) != len(phrase):
+                raise ValueError('Readings do not match the phrase: {0}'.format(phrase))
+            self.phrases[phrase] = tuple(self.__format(_numbered_pinyin(reading)) for reading in readings)
+        self.phrases_checker = utils.text.KeywordsChecker(self.phrases, punctuations_to_trim='')
+        self.phrase_begins = frozenset(phrase[0] for phrase in self.phrases)
+        # Formatted pinyin of the characters converted so far, empty for characters without readings.
+        self.chars = {chr(i): '' for i in range(128)}
+
+    def convert(self, s, separator=''):
+        """Convert a string to pinyin, in which syllables are separated by the separator.
+
+        Characters without readings are kept as they are, and consecutive ones are not separated.
+        """
+        phrases_checker, phrase_begins, chars = self.phrases_checker, self.phrase_begins, self.chars
+        # s[kept:position] are characters without readings that are not appended yet.
+        pinyin, length, position, kept = list(), len(s), 0, 0
+        while position < length:
+            c = s[position]
+            if c in phrase_begins:
+                end = position + phrases_checker.matching_length(s, position)
+                if end > position:
+                    if kept < position:
+                        pinyin.append(s[kept:position])
+                    pinyin.extend(self.phrases[s[position:end]])
+                    position = kept = end
+                    continue
+            p = chars.get(c)
+            if p is None:
+                readings = pinyin_table().get(c)
+                p = chars[c] = self.__format(readings[0]) if readings else ''
+            if p:
+                if kept < position:
+                    pinyin.append(s[kept:position])
+                pinyin.append(p)
+                kept = position + 1
+            position += 1
+        if kept < length:
+            pinyin.append(s[kept:])
+        return separator.join(pinyin)
+
+    def __format(self, reading):
+        """Format a reading of PinyinTable by the tone option.
+        """
+        if self.tone is None:
+            return _toneless_pinyin(reading)
+        if self.tone == 'mark':
+            return _marked_pinyin(reading)
+        return reading[:1].upper() + reading[1:]
+
+
+class PinyinIndex:
+    """Index of strings for prefix search by characters, full pinyin, initials and mixed forms, e.g. '张三' is found by
+    'zhangsan', 'zhangs', 'zs', 'zhs' or '张s'.
+
+    A query matches a string if it can be split into parts which match the leading characters of the string one by one,
+    and a character is matched by itself or by a prefix of any of its readings, case insensitively. Strings are kept in
+    a trie of their characters, in which each node also indexes its children by the first letters of their readings, so
+    a query only walks the branches it can match, regardless of the number of strings.
+    """
+
+    def __init__(self, strings=()):
+        """Initialize with strings.
+        """
+        # A node is ({char: child node}, {first letter: set of child chars}, [strings ending at the node]).
+        self.root, self.size, self.syllables = (dict(), dict(), list()), 0, dict()
+        for string in strings:
+            self.add(string)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, string):
+        """Add a string, duplicated strings are ignored.
+        """
+        node = self.root
+        for c in string:
+            children, heads, _ = node
+            child = children.get(c)
+            if child is None:
+                child = children[c] = (dict(), dict(), list())
+                for syllable in self.__syllables(c):
+                    heads.setdefault(syllable[0], set()).add(c)
+            node = child
+        if string not in node[2]:
+            node[2].append(string)
+            self.size += 1
+
+    def search(self, query, limit=None):
+        """Return the strings matched by the query as a prefix in no particular order, at most limit strings if limit
+        is specified.
+        """
+        query, results, found = query.lower(), list(), set()
+        # (node, length of the query matched by the characters to the node) to visit, each is visited only once.
+        pending, visited = [(self.root, 0)], {(id(self.root), 0)}
+        while pending:
+            node, position = pending.pop()
+            if position == len(query):
+                # All strings under the node are matched.
+                nodes = [node]
+                while nodes:
+                    children, _, strings = nodes.pop()
+                    for string in strings:
+                        if string not in found:
+                            found.add(string)
+                            results.append(string)
+                            if limit is not None and len(results) >= limit:
+                                return results
+                    nodes.extend(children.values())
+                continue
+            children, heads, _ = node
+            for c in heads.get(query[position], ()):
+                child = children[c]
+                for syllable in self.__syllables(c):
+                    # The character is matched by any prefix of the syllable that is also a prefix of the rest query.
+                    length = 0
+                    while length < len(syllable) and position + length < len(query) and \
+                            syllable[length] == query[position + length]:
+                        length += 1
+                        if (id(child), position + length) not in visited:
+                            visited.add((id(child), position + length))
+                            pending.append((child, position + length))
+        return results
+
+    def __syllables(self, c):
+        """Return the lower case character and its readings without tones.
+        """
+        syllables = self.syllables.get(c)
+        if syllables is None:
+            syllables = (c.lower(),) + tuple(sorted({_toneless_pinyin(reading).lower()
+                                                     for reading in pinyin_table().get(c)}))
+            self.syllables[c] = syllables
+        return syllables
+
+
 #
 # Simplified/traditional chinese converter.
 #
@@ -225,7 +727,52 @@ class SimplifiedTraditionalConverter:
 黃黌黶黷黲黽黿鼂鼉鞀鼴齇齊齏齒齔齕齗齟齡齙齠齜齦齬齪齲齷龍龔龕龜誌製谘範鬆冇嚐嘗鬨準鐘彆閒乾儘臟拚作
 """
 
-    def __init__(self, simplified_to_traditional=True):
+    # Simplified and traditional phrases whose characters are not converted correctly one by one, one pair per line.
+    phrases = """历史 歷史
+经历 經歷
+历来 歷來
+历程 歷程
+学历 學歷
+干部 幹部
+干活 幹活
+能干 能幹
+树干 樹幹
+干扰 干擾
+头发 頭髮
+理发 理髮
+白发 白髮
+面条 麵條
+面粉 麵粉
+面包 麵包
+皇后 皇后
+公里 公里
+台风 颱風
+关系 關係
+联系 聯繫
+钟表 鐘錶
+钟情 鍾情
+恢复 恢復
+松树 松樹
+批准 批准
+制度 制度
+山谷 山谷
+汇报 匯報
+伙食 伙食
+茶几 茶几
+舍得 捨得
+特征 特徵
+饥饿 飢餓
+剩余 剩餘
+其余 其餘
+"""
+
+    # Translation table of the BMP mapping each code point to itself, copied by the tables of all converters so that
+    # they share the int objects.
+    __identity_table = None
+
+    def __init__(self, simplified_to_traditional=True, phrases=True):
+        """Initialize with the direction, phrases are converted as a whole before characters if phrases is True.
+        """
         self.simplified_to_traditional_dict = dict()
         self.traditional_to_simplified_dict = dict()
         self.simplified_to_traditional = simplified_to_traditional
@@ -233,19 +780,243 @@ class SimplifiedTraditionalConverter:
             s, t = SimplifiedTraditionalConverter.simplified[i], SimplifiedTraditionalConverter.traditional[i]
             self.simplified_to_traditional_dict[s] = t
             self.traditional_to_simplified_dict[t] = s
+        self.simplified_to_traditional_phrases = dict()
+        self.traditional_to_simplified_phrases = dict()
+        if phrases:
+            for line in SimplifiedTraditionalConverter.phrases.splitlines():
+                s, t = line.split()
+                self.simplified_to_traditional_phrases[s] = t
+                self.traditional_to_simplified_phrases[t] = s
+        # (translation table, phrases checker, pattern of the first chars of phrases) of each direction, compiled from
+        # the dicts on first use, see convert.
+        self.compiled = dict()
 
     def convert(self, s):
-        r, d = list(), self.simplified_to_traditional_dict if self.simplified_to_traditional else self.traditional_to_simplified_dict
-        for c in s:
-            r.append(d[c] if c in d else c)
+        """Convert a string in one linear pass.
+
+        Phrases are matched by longest match from left to right, and the other characters are converted one by one
+        with str.translate. The dicts of the direction are compiled on first use: characters into a list indexed by
+        code points, which str.translate looks up faster than a dict, and phrases into a KeywordsChecker, which is only
+        matched from the characters that begin phrases.
+        """
+        compiled = self.compiled.get(self.simplified_to_traditional)
+        if compiled is None:
+            if self.simplified_to_traditional:
+                d, phrases = self.simplified_to_traditional_dict, self.simplified_to_traditional_phrases
+            else:
+                d, phrases = self.traditional_to_simplified_dict, self.traditional_to_simplified_phrases
+            compiled = self.compiled[self.simplified_to_traditional] = (
+                self.__translation_table(d), utils.text.KeywordsChecker(phrases, punctuations_to_trim=''),
+                re.compile('[{0}]'.format(re.escape(''.join({phrase[0] for phrase in phrases})))) if phrases else None)
+        table, phrases_checker, phrase_begin = compiled
+        if phrase_begin is None:
+            return s.translate(table)
+        phrases = self.simplified_to_traditional_phrases if self.simplified_to_traditional else \
+            self.traditional_to_simplified_phrases
+        # s[kept:] is not converted yet, and no phrase begins in s[kept:position].
+        r, position, kept = list(), 0, 0
+        while True:
+            match = phrase_begin.search(s, position)
+            if match is None:
+                break
+            begin = match.start()
+            end = begin + phrases_checker.matching_length(s, begin)
+            if end > begin:
+                r.append(s[kept:begin].translate(table))
+                r.append(phrases[s[begin:end]])
+                kept = end
+            position = max(end, begin + 1)
+        r.append(s[kept:].translate(table))
         return ''.join(r)
 
+    def __getstate__(self):
+        """Pickle without the compiled tables, which are compiled again on first use.
+        """
+        state = self.__dict__.copy()
+        state['compiled'] = dict()
+        return state
+
+    def convert_stream(self, strings, workers=1, chunk_size=1 << 20):
+        """Yield the converted concatenation of the strings in pieces in order, in bounded memory.
+
+        The strings are buffered into chunks of about chunk_size characters, which are converted in process, or in a
+        pool of worker processes if workers > 1. A chunk is only cut before a character which does not continue any
+        phrase, so the result is the same as converting the whole concatenation at once.
+        """
+        chunks = self.__chunks(strings, chunk_size)
+        if workers <= 1:
+            for chunk in chunks:
+                yield self.convert(chunk)
+            return
+        with multiprocessing.Pool(workers, initializer=_initialize_worker, initargs=(self,)) as pool:
+            # Keep a bounded number of chunks in flight so that the input is consumed lazily.
+            pending = collections.deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(_run_worker, (chunk,)))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+
+    def convert_file(self, source, destination, workers=1, chunk_size=1 << 20, encoding='utf-8'):
+        """Convert a text file to another file in bounded memory, see convert_stream.
+        """
+        with open(source, encoding=encoding, newline='') as source_file, \
+                open(destination, 'w', encoding=encoding, newline='') as destination_file:
+            for converted in self.convert_stream(iter(functools.partial(source_file.read, chunk_size), ''), workers,
+                                                 chunk_size):
+                destination_file.write(converted)
+
+    def __chunks(self, strings, chunk_size):
+        """Yield chunks of the concatenation of the strings for convert_stream.
+        """
+        phrases = self.simplified_to_traditional_phrases if self.simplified_to_traditional else \
+            self.traditional_to_simplified_phrases
+        continuations = {c for phrase in phrases for c in phrase[1:]}
+        buffer, length = list(), 0
+        for string in strings:
+            buffer.append(string)
+            length += len(string)
+            if length < chunk_size:
+                continue
+            text = ''.join(buffer)
+            # The char after the end of text is unknown, so the cut is before the last char not continuing a phrase.
+            # If there is none, more text is buffered.
+            cut = len(text) - 1
+            while cut > 0 and text[cut] in continuations:
+                cut -= 1
+            if cut == 0:
+                buffer = [text]
+                continue
+            yield text[:cut]
+            buffer, length = [text[cut:]], len(text) - cut
+        if length > 0:
+            yield ''.join(buffer)
+
+    @staticmethod
+    def __translation_table(d):
+        if SimplifiedTraditionalConverter.__identity_table is None:
+            SimplifiedTraditionalConverter.__identity_table = list(range(0x10000))
+        table = SimplifiedTraditionalConverter.__identity_table.copy()
+        for c1, c2 in d.items():
+            if ord(c1) >= len(table):
+                table.extend(range(len(table), ord(c1) + 1))
+            table[ord(c1)] = c2
+        return table
+
+
+# Converter of a worker process, see SimplifiedTraditionalConverter.convert_stream.
+_worker_converter = None
+
+
+def _initialize_worker(converter):
+    global _worker_converter
+    _worker_converter = converter
+
+
+def _run_worker(s):
+    return _worker_converter.convert(s)
+
 
 #
 # Calculate PRC ID card number checksum.
 #
 
+__PRC_ID_WEIGHTS = (7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2)
+__PRC_ID_CHECKSUMS = '10X98765432'
+__DAYS_OF_MONTHS = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+# Reasons of rejection indexed by the reason codes of prc_id_validate_many, 0 is valid.
+PRC_ID_REJECTION_REASONS = ('', 'length', 'digit', 'date', 'checksum')
+
+
 def prc_id_checksum(id_num):
-    a1 = [7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2]
-    a2 = ['1', '0', 'X', '9', '8', '7', '6', '5', '4', '3', '2']
-    return a2[sum([x[0] * x[1] for x in zip(a1, [int(_) for _ in id_num[:17]])]) % 11]
+    return __PRC_ID_CHECKSUMS[sum([w * int(c) for w, c in zip(__PRC_ID_WEIGHTS, id_num[:17])]) % 11]
+
+
+def prc_id_validate_many(ids):
+    """Validate 18-character PRC ID card numbers, return (valid mask, reason codes), see PRC_ID_REJECTION_REASONS.
+
+    ids is a sequence of strings, a NumPy array of strings or bytes, or a bytes-like buffer of consecutive 18-byte
+    numbers. An ID is rejected for the first failing check of: 18 characters, 17 digits followed by a digit or 'X'
+    (case insensitive), a valid birth date in characters 7 to 14, and the checksum. Items which are neither strings nor
+    bytes raise TypeError.
+
+    With NumPy, the checks are vectorized over a matrix of character codes and the mask and the reason codes are
+    arrays, otherwise they are lists.
+    """
+    numpy = utils.text._numpy()
+    if isinstance(ids, (bytes, bytearray, memoryview)):
+        if len(ids) % 18 != 0:
+            raise ValueError('Buffer length is not a multiple of 18: {0}'.format(len(ids)))
+        if numpy is not None:
+            return __prc_id_validate_codes(numpy.frombuffer(ids, dtype=numpy.uint8).reshape(-1, 18),
+                                           numpy.full(len(ids) // 18, 18))
+        ids = [bytes(ids[i:i + 18]).decode('latin-1') for i in range(0, len(ids), 18)]
+    if numpy is None:
+        reasons = [__prc_id_reason(__prc_id_string(id_num)) for id_num in ids]
+        return [reason == 0 for reason in reasons], reasons
+    if not isinstance(ids, numpy.ndarray) or ids.dtype.kind not in 'SU':
+        # NumPy would convert other items to strings, so they are checked (and bytes mixed with strings decoded) as
+        # without NumPy, unless all of them are strings or all of them are bytes.
+        ids = list(ids.reshape(-1) if isinstance(ids, numpy.ndarray) else ids)
+        types = set(map(type, ids))
+        if types != {bytes} and not types <= {str}:
+            ids = [__prc_id_string(id_num) for id_num in ids]
+        ids = numpy.array(ids, dtype='S' if types == {bytes} else 'U')
+    # A string of n chars is a row of n uint8 (bytes) or uint32 (str) codes padded with zeros. Strided arrays such as
+    # columns of a table are copied to be viewed as codes.
+    ids = numpy.ascontiguousarray(ids).reshape(-1)
+    lengths = numpy.char.str_len(ids)
+    code_type = numpy.uint8 if ids.dtype.kind == 'S' else numpy.uint32
+    codes = ids.view(code_type).reshape(len(ids), ids.dtype.itemsize // numpy.dtype(code_type).itemsize)
+    if codes.shape[1] < 18:
+        codes = numpy.hstack((codes, numpy.zeros((len(ids), 18 - codes.shape[1]), dtype=codes.dtype)))
+    return __prc_id_validate_codes(codes[:, :18], lengths)
+
+
+def __prc_id_string(id_num):
+    """Return an ID of prc_id_validate_many as a string, bytes are decoded and other types raise TypeError.
+    """
+    if isinstance(id_num, bytes):
+        return id_num.decode('latin-1')
+    if not isinstance(id_num, str):
+        raise TypeError('PRC ID card number is not a string: {0!r}'.format(id_num))
+    return id_num
+
+
+def __prc_id_validate_codes(codes, lengths):
+    """Vectorized prc_id_validate_many over a matrix of character codes and an array of lengths.
+    """
+    numpy = utils.text._numpy()
+    digits = codes.astype(numpy.int64) - ord('0')
+    is_digit = (digits >= 0) & (digits <= 9)
+    last = codes[:, 17]
+    digit_ok = is_digit[:, :17].all(axis=1) & (is_digit[:, 17] | (last == ord('X')) | (last == ord('x')))
+    digits = numpy.where(is_digit, digits, 0)
+    year = digits[:, 6] * 1000 + digits[:, 7] * 100 + digits[:, 8] * 10 + digits[:, 9]
+    month, day = digits[:, 10] * 10 + digits[:, 11], digits[:, 12] * 10 + digits[:, 13]
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    days = numpy.array(__DAYS_OF_MONTHS)[numpy.clip(month, 0, 12)] + ((month == 2) & leap)
+    date_ok = (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= days)
+    checksums = numpy.frombuffer(__PRC_ID_CHECKSUMS.encode('ascii'), dtype=numpy.uint8)[
+        (digits[:, :17] * numpy.array(__PRC_ID_WEIGHTS)).sum(axis=1) % 11]
+    checksum_ok = checksums == numpy.where(last == ord('x'), ord('X'), last)
+    reasons = numpy.select([lengths != 18, ~digit_ok, ~date_ok, ~checksum_ok], [1, 2, 3, 4], 0).astype(numpy.uint8)
+    return reasons == 0, reasons
+
+
+def __prc_id_reason(id_num):
+    """Return the reason code of prc_id_validate_many of an ID.
+    """
+    if len(id_num) != 18:
+        return 1
+    if not (all('0' <= c <= '9' for c in id_num[:17]) and ('0' <= id_num[17] <= '9' or id_num[17] in 'Xx')):
+        return 2
+    year, month, day = int(id_num[6:10]), int(id_num[10:12]), int(id_num[12:14])
+    leap = year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+    if not (year >= 1 and 1 <= month <= 12 and 1 <= day <= __DAYS_OF_MONTHS[month] + (month == 2 and leap)):
+        return 3
+    if prc_id_checksum(id_num) != id_num[17].upper():
+        return 4
+    return 0
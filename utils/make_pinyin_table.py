@@ -0,0 +1,60 @@
+# Regenerate utils/pinyin.dat, the pinyin table of utils.chinese.unicode_to_pinyin.
+#
+# The readings are those of pypinyin 0.55.0 (pypinyin/pinyin_dict.json, derived from Unihan kHanyuPinyin and
+# kMandarin), which is distributed under the following license, see also pinyin.dat.LICENSE:
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 mozillazg, 闲耘 <hotoo.cn@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of
+# the Software, and to permit persons to whom the Software is furnished to do so,
+# subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER
+# IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# Usage:
+#
+#     pip install pypinyin==0.55.0
+#     python -m utils.make_pinyin_table [pinyin_dict.json] [output path]
+#
+# Without arguments, the readings are read from the installed pypinyin and written to utils/pinyin.dat.
+
+import json
+import sys
+import utils.chinese
+
+
+def load_pinyin_dict(path=None):
+    """Return a dict from characters to lists of readings with tone marks, from pypinyin's pinyin_dict.json at path,
+    or from the installed pypinyin if path is None.
+    """
+    if path is None:
+        from pypinyin.pinyin_dict import pinyin_dict
+    else:
+        with open(path, encoding='utf-8') as file:
+            pinyin_dict = json.load(file)
+    return {chr(int(code_point)): readings.split(',') for code_point, readings in pinyin_dict.items()}
+
+
+def make_pinyin_table(source=None, path=utils.chinese.PINYIN_TABLE_PATH):
+    """Build the pinyin table from pypinyin's readings, see load_pinyin_dict, and save it to path.
+    """
+    table = utils.chinese.PinyinTable(load_pinyin_dict(source))
+    table.save(path)
+    return table
+
+
+if __name__ == '__main__':
+    make_pinyin_table(*sys.argv[1:3])
@@ -1,4 +1,5 @@
-from random import random
+from bisect import bisect_left, bisect_right
+import functools
 import time
 import os
 
@@ -18,102 +19,222 @@ import os
 # |  Heapsort        |  O(n log n)       |  O(1)               |  No      |  Low memory cost.                     |
 # |------------------+-------------------+---------------------+----------+---------------------------------------|
 # |  Quicksort       |  O(n log n)       |  O(log n)           |  No      |  Fastest O(n log n) sort in general.  |
+# |  (Introsort)     |                   |                     |          |  Heapsort when too deep, O(n) if all  |
+# |                  |                   |                     |          |  elements are equal.                  |
 # |------------------+-------------------+---------------------+----------+---------------------------------------|
 # |  Merge Sort      |  O(n log n)       |  O(n)               |  Yes     |  Stable O(n log n) sort.              |
+# |------------------+-------------------+---------------------+----------+---------------------------------------|
+# |  Timsort         |  O(n log n)       |  O(n)               |  Yes     |  O(n) when (nearly) sorted.           |
 # -----------------------------------------------------------------------------------------------------------------
 #
+# All sorts sort the list in place by native <, or by compare(x1, x2), which returns a negative number, 0 or a positive
+# number if x1 is less than, equal to or greater than x2, and/or by key(x), which is called once for each element.
+#
+
+def __sort_key(compare, key):
+    """Return a key function for sorting by compare and/or key with native <, or None if neither is specified.
+    """
+    if compare is None:
+        return key
+    compare_key = functools.cmp_to_key(compare)
+    if key is None:
+        return compare_key
+    return lambda x: compare_key(key(x))
+
+
+class __EqualToAll:
+    """Holder of an element decorated as (key, __EqualToAll(element)), which is equal to any other holder, so that
+    decorated elements are compared by their keys only and are equal if their keys are.
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
 
-def bubble_sort(datas, compare=lambda x1, x2: 0 if x1 == x2 else (-1 if x1 < x2 else 1)):
+    def __eq__(self, other):
+        return True
+
+    def __lt__(self, other):
+        return False
+
+
+def __with_key(stable):
+    """Add compare and key to a sort by native <.
+
+    With key, each key is calculated once and the elements themselves are never compared. Elements of a stable sort are
+    decorated as (key, index, element), and elements of an unstable sort as (key, holder) compared by the keys only, so
+    that equal keys stay equal, e.g. for three-way partitioning. With compare, elements (or (key, element) with key) are
+    decorated as objects whose < calls compare once. Elements are undecorated after the sort.
+    """
+    def decorator(sort):
+        @functools.wraps(sort)
+        def sort_with_key(datas, compare=None, key=None):
+            if compare is None and key is None:
+                sort(datas)
+                return
+            if compare is None and stable:
+                decorated = [(key(data), i, data) for i, data in enumerate(datas)]
+                sort(decorated)
+                for i in range(len(datas)):
+                    datas[i] = decorated[i][2]
+            elif compare is None:
+                decorated = [(key(data), __EqualToAll(data)) for data in datas]
+                sort(decorated)
+                for i in range(len(datas)):
+                    datas[i] = decorated[i][1].data
+            elif key is None:
+                compare_key = functools.cmp_to_key(compare)
+                decorated = [compare_key(data) for data in datas]
+                sort(decorated)
+                for i in range(len(datas)):
+                    datas[i] = decorated[i].obj
+            else:
+                compare_key = functools.cmp_to_key(lambda x1, x2: compare(x1[0], x2[0]))
+                decorated = [compare_key((key(data), data)) for data in datas]
+                sort(decorated)
+                for i in range(len(datas)):
+                    datas[i] = decorated[i].obj[1]
+        return sort_with_key
+    return decorator
+
+
+@__with_key(stable=True)
+def bubble_sort(datas):
     """Bubble sort.
     """
     for i in range(len(datas) - 1, 0, -1):
         for j in range(i):
-            if compare(datas[j], datas[j + 1]) > 0:
+            if datas[j + 1] < datas[j]:
                 datas[j], datas[j + 1] = datas[j + 1], datas[j]
 
 
-def selection_sort(datas, compare=lambda x1, x2: 0 if x1 == x2 else (-1 if x1 < x2 else 1)):
+@__with_key(stable=False)
+def selection_sort(datas):
     """Selection sort.
     """
     for i in range(len(datas) - 1):
         min = i
         for j in range(i + 1, len(datas)):
-            if compare(datas[min], datas[j]) > 0:
+            if datas[j] < datas[min]:
                 min = j
         if min != i:
             datas[min], datas[i] = datas[i], datas[min]
 
 
-def insertion_sort(datas, compare=lambda x1, x2: 0 if x1 == x2 else (-1 if x1 < x2 else 1)):
+@__with_key(stable=True)
+def insertion_sort(datas):
     """Insertion sort.
     """
     for i in range(1, len(datas)):
         for j in range(i, 0, -1):
-            if compare(datas[j - 1], datas[j]) > 0:
+            if datas[j] < datas[j - 1]:
                 datas[j - 1], datas[j] = datas[j], datas[j - 1]
             else:
                 break
 
 
-def heapsort(datas, compare=lambda x1, x2: 0 if x1 == x2 else (-1 if x1 < x2 else 1)):
-    """Heapsort.
+def __heapsort_range(datas, low, high):
+    """Heapsort datas[low:high] in place.
     """
     # Repair the max heap.
-    # Given a parent node with index i, its child nodes' indices are i * 2 + 1 and i * 2 + 2
-    def sift_down(datas, parent, max, compare):
+    # Given a parent node with index i, its child nodes' indices are i * 2 + 1 and i * 2 + 2, relative to low
+    def sift_down(datas, parent, max):
         while True:
             child = parent * 2 + 1
             if child >= max:
                 return
-            if child + 1 < max and compare(datas[child], datas[child + 1]) < 0:
+            if child + 1 < max and datas[low + child] < datas[low + child + 1]:
                 child += 1
-            if compare(datas[parent], datas[child]) > 0:
+            if not datas[low + parent] < datas[low + child]:
                 return
-            datas[parent], datas[child], parent = datas[child], datas[parent], child
+            datas[low + parent], datas[low + child], parent = datas[low + child], datas[low + parent], child
 
     # 1. Heapify the array.
     # Given a child node with index i, its parent node's index is (i - 1) // 2
-    length = len(datas)
+    length = high - low
     for i in range(length // 2 - 1, -1, -1):
-        sift_down(datas, i, length, compare)
+        sift_down(datas, i, length)
     # 2. Swap elements and repair the heap repeatedly.
     for i in range(length - 1, 0, -1):
-        datas[0], datas[i] = datas[i], datas[0]
-        sift_down(datas, 0, i, compare)
+        datas[low], datas[low + i] = datas[low + i], datas[low]
+        sift_down(datas, 0, i)
+
+
+@__with_key(stable=False)
+def heapsort(datas):
+    """Heapsort.
+    """
+    __heapsort_range(datas, 0, len(datas))
+
 
+@__with_key(stable=False)
+def quicksort(datas):
+    """Non-recursive introsort.
 
-def quicksort(datas, compare=lambda x1, x2: 0 if x1 == x2 else (-1 if x1 < x2 else 1)):
-    """Non-recursive quicksort.
+    Ranges are partitioned three-way around a median-of-three (or ninther for large ranges) pivot, so that elements
+    equal to the pivot are done at once. Ranges of at most 16 elements are insertion sorted, and ranges deeper than
+    2 * log2(n) partitions are heapsorted, which bounds the worst case to O(n log n).
     """
+    # Index of the median of datas[i], datas[j] and datas[k].
+    def median_of_three(datas, i, j, k):
+        if datas[i] < datas[j]:
+            return j if datas[j] < datas[k] else (k if datas[i] < datas[k] else i)
+        return i if datas[i] < datas[k] else (k if datas[j] < datas[k] else j)
+
+    # Insertion sort datas[left:right + 1].
+    def insertion_sort(datas, left, right):
+        for i in range(left + 1, right + 1):
+            data, j = datas[i], i
+            while j > left and data < datas[j - 1]:
+                datas[j] = datas[j - 1]
+                j -= 1
+            datas[j] = data
+
     if len(datas) <= 1:
         return
     stack = list()
-    stack.append((0, len(datas) - 1))
+    stack.append((0, len(datas) - 1, 2 * (len(datas).bit_length() - 1)))
     while len(stack) > 0:
+        left, right, depth = stack.pop()
+        if right - left < 16:
+            insertion_sort(datas, left, right)
+            continue
+        if depth == 0:
+            __heapsort_range(datas, left, right + 1)
+            continue
         # 1. Choose a pivot.
-        left, right = stack.pop()
-        pivot = left + int(random() * (right - left + 1))
-        # 2. Swap elements to make all elements in the left part are no greater than the pivot,
-        # as well as all elements in the right part are no less than the pivot.
-        i, j, data = left, right, datas[pivot]
-        while i < j:
-            while j > pivot and compare(datas[j], data) >= 0:
+        middle = (left + right) // 2
+        if right - left < 128:
+            pivot = median_of_three(datas, left, middle, right)
+        else:
+            step = (right - left) // 8
+            pivot = median_of_three(datas, median_of_three(datas, left, left + step, left + step * 2),
+                                    median_of_three(datas, middle - step, middle, middle + step),
+                                    median_of_three(datas, right - step * 2, right - step, right))
+        # 2. Swap elements to make all elements in datas[left:i] less than the pivot, all elements in datas[i:j + 1]
+        # equal to the pivot, and all elements in datas[j + 1:right + 1] greater than the pivot.
+        data = datas[pivot]
+        i, k, j = left, left, right
+        while k <= j:
+            if datas[k] < data:
+                datas[i], datas[k] = datas[k], datas[i]
+                i, k = i + 1, k + 1
+            elif data < datas[k]:
+                datas[k], datas[j] = datas[j], datas[k]
                 j -= 1
-            if j > pivot:
-                datas[pivot], pivot = datas[j], j
-            while i < pivot and compare(datas[i], data) <= 0:
-                i += 1
-            if i < pivot:
-                datas[pivot], pivot = datas[i], i
-        datas[pivot] = data
-        # 3. Deal with the left part and the right part separately.
-        if left < pivot - 1:
-            stack.append((left, pivot - 1))
-        if pivot + 1 < right:
-            stack.append((pivot + 1, right))
-
-
-def merge_sort(datas, compare=lambda x1, x2: 0 if x1 == x2 else (-1 if x1 < x2 else 1)):
+            else:
+                k += 1
+        # 3. Deal with the left part and the right part separately, the smaller one first.
+        parts = ((left, i - 1, depth - 1), (j + 1, right, depth - 1))
+        if i - left < right - j:
+            parts = parts[::-1]
+        for part in parts:
+            if part[0] < part[1]:
+                stack.append(part)
+
+
+@__with_key(stable=True)
+def merge_sort(datas):
     """Bottom-up merge sort.
     """
     # Length of merged subarrays after round n is 2 ** n.
@@ -132,7 +253,7 @@ def merge_sort(datas, compare=lambda x1, x2: 0 if x1 == x2 else (-1 if x1 < x2 e
             left, pivot, right = i, min(i + width, length), min(i + width * 2, length)
             j, k = left, pivot
             for p in range(left, right):
-                if (k >= right) or (j < pivot and compare(temp1[j], temp1[k]) <= 0):
+                if (k >= right) or (j < pivot and not temp1[k] < temp1[j]):
                     temp2[p], j = temp1[j], j + 1
                 else:
                     temp2[p], k = temp1[k], k + 1
@@ -143,14 +264,167 @@ def merge_sort(datas, compare=lambda x1, x2: 0 if x1 == x2 else (-1 if x1 < x2 e
         datas[i] = temp1[i]
 
 
+@__with_key(stable=True)
+def timsort(datas):
+    """Adaptive natural-run merge sort (Timsort).
+
+    Ascending and strictly descending runs (reversed) already in the array are found, short runs are extended to a
+    minimum length by binary insertion, and runs are merged so that their lengths on the stack shrink exponentially.
+    A merge switches to galloping when one run keeps winning, and copies a whole slice of it at once.
+    """
+    # Minimum run length, in [32, 64] such that length / min_run is a power of 2 or a bit less.
+    def min_run_length(length):
+        r = 0
+        while length >= 64:
+            r |= length & 1
+            length >>= 1
+        return length + r
+
+    # Sort datas[low:high] by binary insertion, in which datas[low:start] are already sorted.
+    def binary_insertion_sort(datas, low, start, high):
+        for i in range(start, high):
+            data = datas[i]
+            j = bisect_right(datas, data, low, i)
+            datas[j + 1:i + 1] = datas[j:i]
+            datas[j] = data
+
+    # Return the index after the last element no greater than data in sorted datas[low:high], searching from low with
+    # steps of 1, 2, 4, ... and then by bisection.
+    def gallop_right(data, datas, low, high):
+        last, offset = low, 1
+        while low + offset - 1 < high and not data < datas[low + offset - 1]:
+            last, offset = low + offset, offset * 2
+        return bisect_right(datas, data, last, min(low + offset - 1, high))
+
+    # Return the index of the first element no less than data in sorted datas[low:high], see gallop_right.
+    def gallop_left(data, datas, low, high):
+        last, offset = low, 1
+        while low + offset - 1 < high and datas[low + offset - 1] < data:
+            last, offset = low + offset, offset * 2
+        return bisect_left(datas, data, last, min(low + offset - 1, high))
+
+    # Merge the adjacent sorted datas[start1:start2] and datas[start2:end2].
+    def merge(datas, start1, start2, end2):
+        # Elements of run 1 no greater than the first of run 2, and elements of run 2 no less than the last of run 1
+        # are already in place.
+        start1 = gallop_right(datas[start2], datas, start1, start2)
+        if start1 == start2:
+            return
+        end2 = gallop_left(datas[start2 - 1], datas, start2, end2)
+        # Run 1 is moved to a temp array and merged with run 2 from the left.
+        temp, i, j, k, min_gallop = datas[start1:start2], 0, start2, start1, 7
+        while i < len(temp) and j < end2:
+            # One element at a time until one run wins min_gallop times in a row.
+            count1 = count2 = 0
+            while i < len(temp) and j < end2 and count1 < min_gallop and count2 < min_gallop:
+                if datas[j] < temp[i]:
+                    datas[k], j, count1, count2 = datas[j], j + 1, 0, count2 + 1
+                else:
+                    datas[k], i, count1, count2 = temp[i], i + 1, count1 + 1, 0
+                k += 1
+            # Galloping until both runs win less than 7 in a row, which is rewarded with a lower min_gallop.
+            while i < len(temp) and j < end2:
+                count1 = gallop_right(datas[j], temp, i, len(temp)) - i
+                datas[k:k + count1], i, k = temp[i:i + count1], i + count1, k + count1
+                if i == len(temp):
+                    break
+                count2 = gallop_left(temp[i], datas, j, end2) - j
+                datas[k:k + count2], j, k = datas[j:j + count2], j + count2, k + count2
+                if count1 < 7 and count2 < 7:
+                    min_gallop += 1
+                    break
+                min_gallop = max(1, min_gallop - 1)
+        # The rest of run 2 is already in place.
+        datas[k:k + len(temp) - i] = temp[i:]
+
+    # Merge runs[i] and runs[i + 1] of the stack of (start, length).
+    def merge_at(datas, runs, i):
+        (start1, length1), (start2, length2) = runs[i], runs[i + 1]
+        runs[i] = (start1, length1 + length2)
+        del runs[i + 1]
+        merge(datas, start1, start2, start2 + length2)
+
+    length = len(datas)
+    if length < 2:
+        return
+    min_run, runs, start = min_run_length(length), list(), 0
+    while start < length:
+        # 1. Find the next run, and reverse it if it is strictly descending.
+        end = start + 1
+        if end < length and datas[end] < datas[start]:
+            while end + 1 < length and datas[end + 1] < datas[end]:
+                end += 1
+            end += 1
+            datas[start:end] = datas[start:end][::-1]
+        else:
+            while end < length and not datas[end] < datas[end - 1]:
+                end += 1
+        # 2. Extend a short run to min_run elements by binary insertion.
+        if end - start < min_run and end < length:
+            high = min(start + min_run, length)
+            binary_insertion_sort(datas, start, end, high)
+            end = high
+        runs.append((start, end - start))
+        start = end
+        # 3. Merge runs until each length on the stack is greater than the sum of the next two.
+        while len(runs) > 1:
+            n = len(runs) - 2
+            if (n > 0 and runs[n - 1][1] <= runs[n][1] + runs[n + 1][1]) or \
+                    (n > 1 and runs[n - 2][1] <= runs[n - 1][1] + runs[n][1]):
+                if runs[n - 1][1] < runs[n + 1][1]:
+                    n -= 1
+            elif runs[n][1] > runs[n + 1][1]:
+                break
+            merge_at(datas, runs, n)
+    # 4. Merge the remaining runs.
+    while len(runs) > 1:
+        n = len(runs) - 2
+        if n > 0 and runs[n - 1][1] < runs[n + 1][1]:
+            n -= 1
+        merge_at(datas, runs, n)
+
+
+#
+# Adversarial input.
+#
+
+def adversarial_input(length, sort=quicksort):
+    """Return a permutation of range(length) on which the (deterministic) sort partitions worst, by M. D. McIlroy's
+    adversary which decides the order of the elements only when they are compared, for testing and benchmarking.
+    """
+    gas, values, candidate, solid = length, [length] * length, [None], [0]
+
+    class Item(object):
+        def __init__(self, i):
+            self.i = i
+
+        def __lt__(self, other):
+            x, y = self.i, other.i
+            if values[x] == gas and values[y] == gas:
+                values[x if x == candidate[0] else y], solid[0] = solid[0], solid[0] + 1
+            if values[x] == gas:
+                candidate[0] = x
+            elif values[y] == gas:
+                candidate[0] = y
+            return values[x] < values[y]
+
+    sort([Item(i) for i in range(length)])
+    for i in range(length):
+        if values[i] == gas:
+            values[i], solid[0] = solid[0], solid[0] + 1
+    return values
+
+
 #
 # External sorting algorithm.
 #
 
-def external_merge_sort(source, temp=None, target=None,
-                        compare=lambda x1, x2: 0 if (x1 == x2) else (-1 if x1 < x2 else 1),
-                        stable=False, log=print, max_load=10000000, k_way_merge=1):
+def external_merge_sort(source, temp=None, target=None, compare=None, stable=False, log=print, max_load=10000000,
+                        k_way_merge=1, key=None):
     """External merge sort.
+
+    Lines are sorted by native <, compare and/or key as the in-memory sorts, and the key of each line is calculated once
+    when the line is sorted in memory and once when it is loaded for a merge.
     """
     # Calculate temp file name with the specified index.
     def temp_file_name(index):
@@ -158,9 +432,10 @@ def external_merge_sort(source, temp=None, target=None,
 
     # Helper class for loading data from the specified temp file.
     class TempData:
-        def __init__(self, max_load):
+        def __init__(self, max_load, sort_key):
             self.capacity = max_load + 1
             self.cache = [None for _ in range(self.capacity)]
+            self.sort_key, self.keys = sort_key, [None for _ in range(self.capacity)] if sort_key is not None else None
             self.file, self.next_index, self.last_index = None, 0, 0
 
         def reinitialize(self, file):
@@ -188,6 +463,8 @@ def external_merge_sort(source, temp=None, target=None,
                     self.last_index = i
                     return True
                 self.cache[i] = line
+                if self.sort_key is not None:
+                    self.keys[i] = self.sort_key(line)
             return False
 
         def no_more_in_cache(self):
@@ -196,25 +473,29 @@ def external_merge_sort(source, temp=None, target=None,
         def next(self):
             return self.cache[self.next_index]
 
+        def next_key(self):
+            return self.keys[self.next_index] if self.keys is not None else self.cache[self.next_index]
+
         def pop(self):
             next_element = self.cache[self.next_index]
             self.next_index = self.next_index + 1 if self.next_index < self.capacity - 1 else 0
             return next_element
 
     # Repair the min heap.
-    def sift_down(temp_datas, parent, max, compare):
+    def sift_down(temp_datas, parent, max):
         while True:
             child = parent * 2 + 1
             if child >= max:
                 return
-            if child + 1 < max and compare(temp_datas[child].next(), temp_datas[child + 1].next()) > 0:
+            if child + 1 < max and temp_datas[child + 1].next_key() < temp_datas[child].next_key():
                 child += 1
-            if compare(temp_datas[parent].next(), temp_datas[child].next()) <= 0:
+            if not temp_datas[child].next_key() < temp_datas[parent].next_key():
                 return
             temp_datas[parent], temp_datas[child], parent = temp_datas[child], temp_datas[parent], child
 
     # 1. Preparation.
     elapsed_time = time.time()
+    sort_key = __sort_key(compare, key)
     if temp is None:
         temp = '{0}.temp.'.format(source)
     else:
@@ -239,9 +520,9 @@ def external_merge_sort(source, temp=None, target=None,
                 if source_datas_count < max_load:
                     source_datas = source_datas[:source_datas_count]
                 if not stable:
-                    quicksort(source_datas, compare=compare)
+                    quicksort(source_datas, compare=compare, key=key)
                 else:
-                    merge_sort(source_datas, compare=compare)
+                    merge_sort(source_datas, compare=compare, key=key)
                 with open(temp_file_name(temp_files_count), 'w') as temp_file:
                     for i in range(source_datas_count):
                         temp_file.write(source_datas[i])
@@ -260,7 +541,7 @@ def external_merge_sort(source, temp=None, target=None,
     max_load //= k_way_merge + 1
     temp_file_index_max = temp_files_count
     temp_file_index = 0
-    all_temp_datas = [TempData(max_load) for _ in range(k_way_merge)]
+    all_temp_datas = [TempData(max_load, sort_key) for _ in range(k_way_merge)]
     merged_datas = [None for _ in range(max_load)]
     done = False
     while not done:
@@ -304,14 +585,14 @@ def external_merge_sort(source, temp=None, target=None,
                 merged_count = max_load
                 if not stable:
                     for i in range(len(temp_datas) // 2 - 1, -1, -1):
-                        sift_down(temp_datas, i, len(temp_datas), compare)
+                        sift_down(temp_datas, i, len(temp_datas))
                 for i in range(max_load):
                     temp_index = 0
                     if not stable:
-                        sift_down(temp_datas, 0, len(temp_datas), compare)
+                        sift_down(temp_datas, 0, len(temp_datas))
                     else:
                         for j in range(1, len(temp_datas)):
-                            if compare(temp_datas[temp_index].next(), temp_datas[j].next()) > 0:
+                            if temp_datas[j].next_key() < temp_datas[temp_index].next_key():
                                 temp_index = j
                     merged_datas[i] = temp_datas[temp_index].pop()
                     if temp_datas[temp_index].no_more_in_cache():
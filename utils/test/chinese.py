@@ -1,5 +1,10 @@
 import unittest
 import utils.chinese
+import utils.text
+import os
+import pickle
+import subprocess
+import sys
 
 
 class ChineseToPinyinTest(unittest.TestCase):
@@ -13,17 +18,128 @@ class ChineseToPinyinTest(unittest.TestCase):
     def test_gb2312_to_pinyin_non_gb2312(self):
         self.assertEqual(utils.chinese.gb2312_to_pinyin('周鸿祎'), 'ZhouHong*')
 
+    def test_gb2312_to_pinyin_ascii(self):
+        self.assertEqual(utils.chinese.gb2312_to_pinyin('a1 B2\0'), 'a1 B2*')
+        self.assertEqual(utils.chinese.gb2312_to_pinyin('Python是', acronym=True), 'PythonS')
+
     def test_gb2312_to_pinyin(self):
         self.assertEqual(utils.chinese.gb2312_to_pinyin('Python是一种面向对象、解释型计算机程序设计语言。'),
                          'PythonShiYiZhongMianXiangDuiXiangJieShiXingJiSuanJiChengXuSheJiYuYan')
         self.assertEqual(utils.chinese.gb2312_to_pinyin('天下武功出少林', acronym=True), 'TXWGCSL')
 
 
+class ChineseToPinyinBatchTest(unittest.TestCase):
+    def test_gb2312_to_pinyin_many(self):
+        strings = ['张三', '李四', '', '周鸿祎', '张三']
+        expected = [utils.chinese.gb2312_to_pinyin(s) for s in strings]
+        self.assertEqual(list(utils.chinese.gb2312_to_pinyin_many(iter(strings))), expected)
+        self.assertEqual(list(utils.chinese.gb2312_to_pinyin_many(strings, acronym=True)), ['ZS', 'LS', '', 'ZH*', 'ZS'])
+        cache = utils.chinese.PinyinCache(maxsize=2)
+        self.assertEqual(list(utils.chinese.gb2312_to_pinyin_many(strings, cache=cache)), expected)
+        self.assertEqual(cache.cache_info()[:2], (0, 5))
+        self.assertEqual(list(utils.chinese.gb2312_to_pinyin_many(['周鸿祎', '周鸿祎'], cache=cache)), ['ZhouHong*'] * 2)
+        self.assertEqual(cache.cache_info()[:2], (2, 5))
+
+    def test_gb2312_to_pinyin_csv(self):
+        source, destination = 'test_pinyin_source.csv', 'test_pinyin_destination.csv'
+        with open(source, 'w', newline='', encoding='utf-8') as file:
+            file.write('id,name,city\r\n1,张三,北京\r\n2,"李,四",上海\r\n3\r\n')
+        utils.chinese.gb2312_to_pinyin_csv(source, destination, ['name', 2], cache=utils.chinese.PinyinCache())
+        with open(destination, newline='', encoding='utf-8') as file:
+            self.assertEqual(file.read(), 'id,name,city\r\n1,ZhangSan,BeiJing\r\n2,"Li,Si",ShangHai\r\n3\r\n')
+        utils.chinese.gb2312_to_pinyin_csv(source, destination, [1], acronym=True)
+        with open(destination, newline='', encoding='utf-8') as file:
+            self.assertEqual(file.read(), 'id,name,city\r\n1,ZS,北京\r\n2,"L,S",上海\r\n3\r\n')
+        os.remove(source)
+        os.remove(destination)
+
+
+class UnicodeToPinyinTest(unittest.TestCase):
+    def test_unicode_to_pinyin(self):
+        self.assertEqual(utils.chinese.unicode_to_pinyin(''), '')
+        self.assertEqual(utils.chinese.unicode_to_pinyin('周鸿祎'), 'ZhouHongYi')
+        self.assertEqual(utils.chinese.unicode_to_pinyin('周鸿祎', acronym=True), 'ZHY')
+        self.assertEqual(utils.chinese.unicode_to_pinyin('Python是一种语言。'), 'PythonShiYiZhongYuYan。')
+        self.assertEqual(utils.chinese.unicode_to_pinyin('绿略𠀀'), 'LvLueHe')
+
+    def test_pinyin_readings(self):
+        self.assertEqual(utils.chinese.pinyin_readings('绿'), ('lv4', 'lu4'))
+        self.assertEqual(utils.chinese.pinyin_readings('a'), ())
+
+    def test_pinyin_table_save_and_load(self):
+        path = 'test_pinyin_table.dat'
+        table = utils.chinese.PinyinTable({'绿': ['lǜ', 'lù'], '率': ['lv4', 'shuai4'], '𠀀': ['hē'], '的': ['de5']})
+        table.save(path)
+        for mmap in (False, True):
+            table = utils.chinese.PinyinTable.load(path, mmap=mmap)
+            self.assertEqual(table.get('绿'), ('lv4', 'lu4'))
+            self.assertEqual(table.get('率'), ('lv4', 'shuai4'))
+            self.assertEqual(table.get('𠀀'), ('he1',))
+            self.assertEqual(table.get('的'), ('de',))
+            self.assertEqual(table.get('了'), ())
+        os.remove(path)
+
+
+class PinyinConverterTest(unittest.TestCase):
+    def test_convert(self):
+        converter = utils.chinese.PinyinConverter()
+        self.assertEqual(converter.convert(''), '')
+        self.assertEqual(converter.convert('重庆银行的行长'), 'ChongQingYinHangDeHangZhang')
+        self.assertEqual(converter.convert('长大后去长城'), 'ZhangDaHouQuChangCheng')
+        self.assertEqual(converter.convert('重要 Python 3!'), 'ZhongYao Python 3!')
+        self.assertEqual(converter.convert('重庆 Python，行', ' '), 'Chong Qing  Python， Xing')
+
+    def test_convert_tone(self):
+        self.assertEqual(utils.chinese.PinyinConverter(tone='number').convert('音乐绿了'), 'Yin1Yue4Lv4Le')
+        self.assertEqual(utils.chinese.PinyinConverter(tone='mark').convert('音乐绿了'), 'YīnYuèLǜLe')
+        self.assertEqual(utils.chinese.PinyinConverter(tone='mark').convert('省略说'), 'ShěngLüèShuō')
+        with self.assertRaises(ValueError):
+            utils.chinese.PinyinConverter(tone='letter')
+
+    def test_convert_phrases(self):
+        converter = utils.chinese.PinyinConverter({'音乐会': ['yīn', 'yuè', 'huì'], '会计': ['hui4', 'ji4']})
+        self.assertEqual(converter.convert('音乐会计'), 'YinYueHuiJi')
+        with self.assertRaises(ValueError):
+            utils.chinese.PinyinConverter({'音乐': ['yin1']})
+
+    def test_pickle(self):
+        converter = pickle.loads(pickle.dumps(utils.chinese.PinyinConverter(tone='number')))
+        self.assertEqual(converter.convert('重庆'), 'Chong2Qing4')
+        self.assertEqual(converter.convert('重庆银行的行长'), 'Chong2Qing4Yin2Hang2DeHang2Zhang3')
+
+
+class PinyinIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = utils.chinese.PinyinIndex(['张三', '张三丰', '李四', '章子怡', 'Zhang San', '重庆', '张三'])
+
+    def test_pinyin_index_empty(self):
+        index = utils.chinese.PinyinIndex()
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.search('zs'), [])
+
+    def test_pinyin_index_search(self):
+        self.assertEqual(len(self.index), 6)
+        for query in ('zhangsan', 'zhangs', 'zs', 'zhs', '张s', 'ZhangS', '张san'):
+            self.assertEqual(sorted(self.index.search(query)), ['张三', '张三丰'])
+        self.assertEqual(sorted(self.index.search('zhang')), ['Zhang San', '张三', '张三丰', '章子怡'])
+        self.assertEqual(self.index.search('zz'), ['章子怡'])
+        self.assertEqual(self.index.search('chongq'), ['重庆'])
+        self.assertEqual(self.index.search('zhongq'), ['重庆'])
+        self.assertEqual(self.index.search('x'), [])
+        self.assertEqual(len(self.index.search('')), 6)
+        self.assertEqual(len(self.index.search('z', limit=2)), 2)
+
+    def test_pinyin_index_add(self):
+        self.index.add('李斯')
+        self.assertEqual(len(self.index), 7)
+        self.assertEqual(sorted(self.index.search('lis')), ['李四', '李斯'])
+
+
 class SimplifiedTraditionalConverterTest(unittest.TestCase):
     def test_simplified_to_traditional(self):
         converter = utils.chinese.SimplifiedTraditionalConverter()
         self.assertEqual(converter.convert('梅长苏，琅琊榜首，天下第一大帮江左盟宗主。'), '梅長蘇，琅琊榜首，天下第壹大幫江左盟宗主。')
-        self.assertEqual(converter.convert('乐高公司创办于丹麦，至今已有85年的发展历史，追本溯源，还得从它的金字招牌LEGO说起。'), '樂高公司創辦於丹麥，至今已有85年的發展曆史，追本溯源，還得從它的金字招牌LEGO說起。')
+        self.assertEqual(converter.convert('乐高公司创办于丹麦，至今已有85年的发展历史，追本溯源，还得从它的金字招牌LEGO说起。'), '樂高公司創辦於丹麥，至今已有85年的發展歷史，追本溯源，還得從它的金字招牌LEGO說起。')
 
     def test_traditional_to_simplified(self):
         converter = utils.chinese.SimplifiedTraditionalConverter()
@@ -31,7 +147,97 @@ class SimplifiedTraditionalConverterTest(unittest.TestCase):
         self.assertEqual(converter.convert('這次，請和我壹起學習壹個簡單的漢語句子。'), '这次，请和我一起学习一个简单的汉语句子。')
         self.assertEqual(converter.convert('《變形金剛 第壹代》是歐美類型動漫,于2016-12-29上映。愛奇藝在線觀看《變形金剛 第壹代》全集高清視頻'), '《变形金刚 第一代》是欧美类型动漫,于2016-12-29上映。爱奇艺在线观看《变形金刚 第一代》全集高清视频')
 
+    def test_convert_both_directions(self):
+        converter = utils.chinese.SimplifiedTraditionalConverter()
+        self.assertEqual(converter.convert(''), '')
+        self.assertEqual(converter.convert('汉语𠀀abc'), '漢語𠀀abc')
+        converter.simplified_to_traditional = False
+        self.assertEqual(converter.convert('漢語𠀀abc'), '汉语𠀀abc')
+        converter.simplified_to_traditional = True
+        self.assertEqual(converter.convert('汉语'), '漢語')
+
+    def test_convert_phrases(self):
+        converter = utils.chinese.SimplifiedTraditionalConverter()
+        self.assertEqual(converter.convert('干部的头发和面包，经历历史'), '幹部的頭髮和麵包，經歷歷史')
+        self.assertEqual(converter.convert('干杯，历'), '乾杯，曆')
+        converter.simplified_to_traditional = False
+        self.assertEqual(converter.convert('幹部的頭髮和麵包，經歷歷史，剩餘'), '干部的头发和面包，经历历史，剩余')
+        converter = utils.chinese.SimplifiedTraditionalConverter(phrases=False)
+        self.assertEqual(converter.convert('历史'), '曆史')
+
+    def test_convert_stream(self):
+        converter = utils.chinese.SimplifiedTraditionalConverter()
+        text = '干部的头发和面包，经历历史。' * 50
+        strings = [text[i:i + 7] for i in range(0, len(text), 7)]
+        for chunk_size in (1, 2, 10, 100):
+            self.assertEqual(''.join(converter.convert_stream(iter(strings), chunk_size=chunk_size)),
+                             converter.convert(text))
+        self.assertEqual(''.join(converter.convert_stream(strings, workers=2, chunk_size=10)), converter.convert(text))
+        self.assertEqual(list(converter.convert_stream([])), [])
+
+    def test_convert_file(self):
+        source, destination = 'test_converter_source.txt', 'test_converter_destination.txt'
+        with open(source, 'w', encoding='utf-8', newline='') as file:
+            file.write('干部的头发\r\n经历历史\n' * 100)
+        converter = utils.chinese.SimplifiedTraditionalConverter()
+        converter.convert_file(source, destination, chunk_size=16)
+        with open(destination, encoding='utf-8', newline='') as file:
+            self.assertEqual(file.read(), '幹部的頭髮\r\n經歷歷史\n' * 100)
+        os.remove(source)
+        os.remove(destination)
+
 
 class PrcIdChecksumTest(unittest.TestCase):
     def test_prc_id_checksum(self):
         self.assertEqual(utils.chinese.prc_id_checksum('34052419800101001'), 'X')
+
+    def test_prc_id_validate_many(self):
+        ids = ['34052419800101001X', '34052419800101001x', '3405241980010100', '3405241980010100AX', '340524198002300010',
+               '340524198001010011', '110101200002290018']
+        expected = [0, 0, 1, 2, 3, 4, 0]
+        numpy = utils.text._numpy()
+        for module_numpy in {numpy, None}:
+            utils.text.numpy = module_numpy
+            try:
+                valid, reasons = utils.chinese.prc_id_validate_many(ids)
+                self.assertEqual(list(reasons), expected)
+                self.assertEqual(list(valid), [reason == 0 for reason in expected])
+                valid, reasons = utils.chinese.prc_id_validate_many(''.join(ids[:2] + ids[3:]).encode('ascii'))
+                self.assertEqual(list(reasons), [0, 0, 2, 3, 4, 0])
+                with self.assertRaises(ValueError):
+                    utils.chinese.prc_id_validate_many(b'1234')
+                # Bytes are decoded, other items are rejected with or without NumPy.
+                valid, reasons = utils.chinese.prc_id_validate_many([ids[0].encode('ascii'), ids[2]])
+                self.assertEqual(list(reasons), [0, 1])
+                for items in ([ids[0], 340524198001010011], [None], [ids[0], ['34052419800101001X']]):
+                    with self.assertRaises(TypeError):
+                        utils.chinese.prc_id_validate_many(items)
+            finally:
+                utils.text.numpy = numpy
+        self.assertEqual([utils.chinese.PRC_ID_REJECTION_REASONS[reason] for reason in expected],
+                         ['', '', 'length', 'digit', 'date', 'checksum', ''])
+
+    def test_numpy_imported_on_first_use(self):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        code = 'import sys, utils.chinese; print("numpy" in sys.modules)'
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=root)
+        self.assertEqual(output.strip(), b'False')
+
+    @unittest.skipIf(utils.text._numpy() is None, 'NumPy is not available')
+    def test_prc_id_validate_many_numpy_array(self):
+        ids = ['34052419800101001X', '3405241980010100', '340524198001010011']
+        for array in (utils.text.numpy.array(ids), utils.text.numpy.array([s.encode('ascii') for s in ids])):
+            valid, reasons = utils.chinese.prc_id_validate_many(array)
+            self.assertEqual(reasons.tolist(), [0, 1, 4])
+            # Strided arrays, every other element and a column of a table.
+            valid, reasons = utils.chinese.prc_id_validate_many(array[::2])
+            self.assertEqual(reasons.tolist(), [0, 4])
+            table = utils.text.numpy.stack((array, array[::-1]), axis=1)
+            valid, reasons = utils.chinese.prc_id_validate_many(table[:, 1])
+            self.assertEqual(reasons.tolist(), [4, 1, 0])
+        # Arrays of objects are checked as sequences, and arrays of numbers are rejected.
+        valid, reasons = utils.chinese.prc_id_validate_many(utils.text.numpy.array(ids, dtype=object))
+        self.assertEqual(reasons.tolist(), [0, 1, 4])
+        for array in (utils.text.numpy.array([340524198001010011]), utils.text.numpy.array([ids[0], 1], dtype=object)):
+            with self.assertRaises(TypeError):
+                utils.chinese.prc_id_validate_many(array)
@@ -1,3 +1,4 @@
+import math
 import unittest
 import utils.sorting
 from random import random
@@ -44,6 +45,7 @@ class SortingUtilsTest(unittest.TestCase):
         self.do_test_none(utils.sorting.heapsort)
         self.do_test_none(utils.sorting.quicksort)
         self.do_test_none(utils.sorting.merge_sort)
+        self.do_test_none(utils.sorting.timsort)
 
     def do_test_length_n(self, n, sort):
         datas, expected = list(range(n)), list(range(n))
@@ -63,6 +65,7 @@ class SortingUtilsTest(unittest.TestCase):
             self.do_test_length_n(i, utils.sorting.heapsort)
             self.do_test_length_n(i, utils.sorting.quicksort)
             self.do_test_length_n(i, utils.sorting.merge_sort)
+            self.do_test_length_n(i, utils.sorting.timsort)
 
     def do_test_stable(self, sort):
         length = 128
@@ -73,14 +76,106 @@ class SortingUtilsTest(unittest.TestCase):
             self.assertTrue((e1.value < e2.value) or (e1.value == e2.value and e1.priority < e2.priority))
 
     def test_stable(self):
-        """Bubble sort, insertion sort and merge sort are stable.
+        """Bubble sort, insertion sort, merge sort and timsort are stable.
         """
         for i in range(1):
             self.do_test_stable(utils.sorting.bubble_sort)
             self.do_test_stable(utils.sorting.insertion_sort)
             self.do_test_stable(utils.sorting.merge_sort)
+            self.do_test_stable(utils.sorting.timsort)
 
-    def do_test_external_merge_sort(self, data_size, max_load, k_way_merge, stable):
+    def test_quicksort_worst_case(self):
+        """Test quicksort with an adversarial input, which is heapsorted when partitioned too deep, and duplicates.
+        """
+        class Counter(object):
+            count = 0
+
+            def __init__(self, value):
+                self.value = value
+
+            def __lt__(self, other):
+                Counter.count += 1
+                return self.value < other.value
+
+        length = 2000
+        for values in (utils.sorting.adversarial_input(length), [int(random() * 3) for _ in range(length)],
+                       [0] * length, list(range(length)), list(range(length, 0, -1))):
+            datas = [Counter(value) for value in values]
+            Counter.count = 0
+            utils.sorting.quicksort(datas)
+            self.assertEqual([e.value for e in datas], sorted(values))
+            self.assertLess(Counter.count, 8 * length * math.log2(length))
+
+    def test_timsort_runs(self):
+        """Test timsort with runs, including descending runs with equal elements and runs long enough to gallop.
+        """
+        length = 5000
+        ascending = sorted(int(random() * length) for _ in range(length))
+        inputs = [ascending, ascending[::-1], ascending[:length // 2] + ascending[:length // 2][::-1],
+                  ascending[length // 2:] + ascending[:length // 2], [int(random() * 3) for _ in range(length)]]
+        nearly_sorted = ascending[:]
+        for i in range(50):
+            j, k = int(random() * length), int(random() * length)
+            nearly_sorted[j], nearly_sorted[k] = nearly_sorted[k], nearly_sorted[j]
+        inputs.append(nearly_sorted)
+        for values in inputs:
+            datas = [Element(value, i) for i, value in enumerate(values)]
+            utils.sorting.timsort(datas)
+            self.assertEqual([(e.value, e.priority) for e in datas],
+                             sorted((value, i) for i, value in enumerate(values)))
+
+    def test_key(self):
+        """Test sort behavior with key and compare.
+        """
+        sorts = (utils.sorting.bubble_sort, utils.sorting.selection_sort, utils.sorting.insertion_sort,
+                 utils.sorting.heapsort, utils.sorting.quicksort, utils.sorting.merge_sort, utils.sorting.timsort)
+        stable_sorts = (utils.sorting.bubble_sort, utils.sorting.insertion_sort, utils.sorting.merge_sort,
+                        utils.sorting.timsort)
+        for sort in sorts:
+            datas = [int(random() * 50) for _ in range(100)]
+            expected = sorted(datas, reverse=True)
+            sort(datas, key=lambda x: -x)
+            self.assertEqual(datas, expected)
+            sort(datas, compare=lambda x1, x2: x1 - x2)
+            self.assertEqual(datas, sorted(datas))
+            sort(datas, compare=lambda x1, x2: x1 - x2, key=lambda x: -x)
+            self.assertEqual(datas, expected)
+            # Elements are never compared when sorted by key, and equal keys keep their order in stable sorts.
+            datas = [(int(random() * 10), object()) for _ in range(100)]
+            expected = sorted(datas, key=lambda x: x[0])
+            sort(datas, key=lambda x: x[0])
+            if sort in stable_sorts:
+                self.assertEqual(datas, expected)
+            else:
+                self.assertEqual([x[0] for x in datas], [x[0] for x in expected])
+                self.assertEqual(set(map(id, datas)), set(map(id, expected)))
+
+    def test_key_duplicates(self):
+        """Equal keys are equal for unstable sorts by key, so that quicksort partitions them at once.
+        """
+        class Key(object):
+            count = 0
+
+            def __init__(self, value):
+                self.value = value
+
+            def __eq__(self, other):
+                Key.count += 1
+                return self.value == other.value
+
+            def __lt__(self, other):
+                Key.count += 1
+                return self.value < other.value
+
+        length = 2000
+        for values in ([0] * length, [int(random() * 3) for _ in range(length)]):
+            datas = list(range(length))
+            Key.count = 0
+            utils.sorting.quicksort(datas, key=lambda i: Key(values[i]))
+            self.assertEqual([values[i] for i in datas], sorted(values))
+            self.assertLess(Key.count, 8 * length)
+
+    def do_test_external_merge_sort(self, data_size, max_load, k_way_merge, stable, key=False):
         source = 'test_external_merge_sort_{0}_{1}.source'.format(data_size, 'stable' if stable else 'nonstable')
         target = 'test_external_merge_sort_{0}_{1}.sorted'.format(data_size, 'stable' if stable else 'nonstable')
         sep = ', '
@@ -88,9 +183,13 @@ class SortingUtilsTest(unittest.TestCase):
         with open(source, 'w') as source_file:
             for i in range(data_size):
                 source_file.write('{0}{1}{2}\n'.format(int(random() * data_size), sep, i))
+        if key:
+            compare, key = None, lambda x: int(x.split(sep)[0])
+        else:
+            key = None
         utils.sorting.external_merge_sort(source, target=target, compare=compare,
                                           stable=stable, log=log,
-                                          max_load=max_load, k_way_merge=k_way_merge)
+                                          max_load=max_load, k_way_merge=k_way_merge, key=key)
         with open(target, 'r') as target_file:
             previous_line = None
             for i in range(data_size):
@@ -152,6 +251,11 @@ class SortingUtilsTest(unittest.TestCase):
         self.do_test_external_merge_sort(100, 10, 10, stable=False)
         self.do_test_external_merge_sort(100, 10, 10, stable=True)
         #
+        # Test external merge sort with key.
+        #
+        self.do_test_external_merge_sort(100, 10, 3, stable=False, key=True)
+        self.do_test_external_merge_sort(100, 10, 3, stable=True, key=True)
+        #
         # Test external merge sort with random factor values.
         #
         for i in range(1):
@@ -1,5 +1,9 @@
 import unittest
 import utils.text
+import io
+import os
+import pickle
+from random import random
 
 
 class KeywordsCheckerTest(unittest.TestCase):
@@ -76,6 +80,262 @@ class KeywordsCheckerTest(unittest.TestCase):
         self.assertTrue('违法网站' in contained_keywords)
         self.assertEqual(len(contained_keywords), 2)
 
+    #
+    # Test KeywordsChecker.find_keywords
+    #
+    def test_key_words_checker_find_keywords(self):
+        string = '如何根据敏感词过滤违-法+网=站？'
+        self.assertEqual(list(self.keywordsChecker1.find_keywords(string)), [(4, 6, '敏感'), (9, 16, '违法网站')])
+        self.assertEqual(list(self.keywordsChecker1.find_keywords(string, maximum_match=True)),
+                         [(4, 7, '敏感词'), (9, 16, '违法网站')])
+        self.assertEqual(list(self.keywordsChecker2.find_keywords(string)), [(4, 6, '敏感')])
+        checker = utils.text.KeywordsChecker(['暴力', '违法网站', '敏感', '敏感词'], compact=True)
+        self.assertEqual(list(checker.find_keywords(string)), [(4, 6, '敏感'), (9, 16, '违法网站')])
+        # Punctuations before, after and between keywords are counted in the offsets.
+        string = '，，暴力。。 敏-感词 ，'
+        self.assertEqual(list(self.keywordsChecker1.find_keywords(string)), [(2, 4, '暴力'), (7, 10, '敏感')])
+        self.assertEqual(list(self.keywordsChecker1.find_keywords(string, maximum_match=True)),
+                         [(2, 4, '暴力'), (7, 11, '敏感词')])
+
+
+class AhoCorasickKeywordsCheckerTest(unittest.TestCase):
+    def setUp(self):
+        keywords = ['暴力', '违法网站', '敏感', '敏感词']
+        self.keywordsChecker1 = utils.text.KeywordsChecker(keywords, aho_corasick=True)
+        self.keywordsChecker2 = utils.text.KeywordsChecker(keywords, punctuations_to_trim='', aho_corasick=True)
+
+    def test_aho_corasick_contains_keywords(self):
+        self.assertFalse(self.keywordsChecker1.contains_keywords(''))
+        self.assertFalse(self.keywordsChecker2.contains_keywords('暴%力`是$不能解决问题的'))
+        self.assertTrue(self.keywordsChecker1.contains_keywords('暴%力`是$不能解决问题的'))
+        self.assertTrue(self.keywordsChecker1.contains_keywords('警方查封了一#个*违-法+网=站'))
+
+    def test_aho_corasick_get_contained_keywords(self):
+        self.assertEqual(self.keywordsChecker1.get_contained_keywords('如何根据敏感词过滤违法网站？'), ['敏感', '违法网站'])
+        self.assertEqual(self.keywordsChecker1.get_contained_keywords('如何根据敏感词过滤违法网站？', maximum_match=True),
+                         ['敏感词', '违法网站'])
+
+    def test_aho_corasick_leftmost_match(self):
+        checker = utils.text.KeywordsChecker(['abcd', 'bc', 'd', 'cde'], aho_corasick=True)
+        self.assertEqual(checker.get_contained_keywords('abcdx'), ['abcd'])
+        self.assertEqual(checker.get_contained_keywords('abcex'), ['bc'])
+        self.assertEqual(checker.get_contained_keywords('abcdexd'), ['abcd', 'd'])
+
+    def test_aho_corasick_same_as_trie(self):
+        for i in range(100):
+            keywords = [''.join('abc'[int(random() * 3)] for _ in range(1 + int(random() * 4))) for _ in range(5)]
+            string = ''.join('abc-'[int(random() * 4)] for _ in range(30))
+            chunks = [string[j: j + 7] for j in range(0, len(string), 7)]
+            checker1 = utils.text.KeywordsChecker(keywords)
+            checker2 = utils.text.KeywordsChecker(keywords, aho_corasick=True)
+            self.assertEqual(checker1.contains_keywords(string), checker2.contains_keywords(string))
+            for maximum_match in (False, True):
+                self.assertEqual(checker1.get_contained_keywords(string, maximum_match),
+                                 checker2.get_contained_keywords(string, maximum_match))
+                matches = list(checker1.find_keywords(string, maximum_match))
+                self.assertEqual(list(checker2.find_keywords(string, maximum_match)), matches)
+                self.assertEqual(list(checker2.scan_stream(chunks, maximum_match)), matches)
+
+
+class CompactKeywordsCheckerTest(unittest.TestCase):
+    def test_compact_keywords_checker(self):
+        checker = utils.text.KeywordsChecker(['暴力', '违法网站', '敏感', '敏感词', ''], compact=True)
+        self.assertIsNone(checker.keywords_trie)
+        self.assertFalse(checker.contains_keywords(''))
+        self.assertTrue(checker.contains_keywords('警方查封了一#个*违-法+网=站'))
+        self.assertEqual(checker.get_contained_keywords('如何根据敏感词过滤违法网站？'), ['敏感', '违法网站'])
+        self.assertEqual(checker.get_contained_keywords('如何根据敏感词过滤违法网站？', maximum_match=True),
+                         ['敏感词', '违法网站'])
+
+    def test_compact_same_as_trie(self):
+        for i in range(100):
+            keywords = [''.join('abc'[int(random() * 3)] for _ in range(1 + int(random() * 4))) for _ in range(5)]
+            string = ''.join('abc'[int(random() * 3)] for _ in range(30))
+            checker1 = utils.text.KeywordsChecker(keywords)
+            checker2 = utils.text.KeywordsChecker(keywords, compact=True)
+            self.assertEqual(checker1.contains_keywords(string), checker2.contains_keywords(string))
+            for maximum_match in (False, True):
+                self.assertEqual(checker1.get_contained_keywords(string, maximum_match),
+                                 checker2.get_contained_keywords(string, maximum_match))
+
+    def test_matching_length(self):
+        for options in ({}, {'aho_corasick': True}, {'compact': True}):
+            checker = utils.text.KeywordsChecker(['暴力', '违法网站', '敏感', '敏感词', '感词语'], **options)
+            for checker in (checker, pickle.loads(pickle.dumps(checker))):
+                self.assertEqual(checker.matching_length(''), 0)
+                self.assertEqual(checker.matching_length('敏感词语'), 3)
+                self.assertEqual(checker.matching_length('敏感词语', maximum_match=False), 2)
+                self.assertEqual(checker.matching_length('敏感词语', 1), 3)
+                self.assertEqual(checker.matching_length('违法网', 0), 0)
+                self.assertEqual(checker.matching_length('暴-力', 0), 0)
+        for i in range(100):
+            keywords = [''.join('abc'[int(random() * 3)] for _ in range(1 + int(random() * 4))) for _ in range(5)]
+            string = ''.join('abc'[int(random() * 3)] for _ in range(10))
+            checkers = [utils.text.KeywordsChecker(keywords, **options)
+                        for options in ({}, {'aho_corasick': True}, {'compact': True})]
+            checkers[1].keywords_trie = None
+            for begin in range(len(string)):
+                for maximum_match in (False, True):
+                    self.assertEqual(len({checker.matching_length(string, begin, maximum_match)
+                                          for checker in checkers}), 1)
+
+
+class KeywordsCheckerStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.keywordsChecker = utils.text.KeywordsChecker(['暴力', '违法网站', '敏感', '敏感词'])
+
+    def test_scan_stream_chunks(self):
+        chunks = ['如何根据敏', '感词过滤违-法', '网', '站？暴', '力']
+        self.assertEqual(list(self.keywordsChecker.scan_stream(chunks)),
+                         [(4, 6, '敏感'), (9, 14, '违法网站'), (15, 17, '暴力')])
+        self.assertEqual(list(self.keywordsChecker.scan_stream(chunks, maximum_match=True)),
+                         [(4, 7, '敏感词'), (9, 14, '违法网站'), (15, 17, '暴力')])
+
+    def test_scan_stream_file(self):
+        string = '警方查封了一#个*违-法+网=站。' * 1000
+        matches = list(self.keywordsChecker.scan_stream(io.StringIO(string), chunk_size=7))
+        self.assertEqual(len(matches), 1000)
+        for begin, end, keyword in matches:
+            self.assertEqual(keyword, '违法网站')
+            self.assertEqual(string[begin: end], '违-法+网=站')
+
+    def test_scan_stream_binary_file(self):
+        with self.assertRaises(TypeError):
+            list(self.keywordsChecker.scan_stream(io.BytesIO('违法网站'.encode('utf-8'))))
+        with self.assertRaises(TypeError):
+            list(self.keywordsChecker.scan_stream([b'abc']))
+        self.assertEqual(list(self.keywordsChecker.scan_stream(io.BytesIO(b''))), [])
+
+
+class KeywordsCheckerUpdateTest(unittest.TestCase):
+    def do_test_update(self, aho_corasick):
+        checker = utils.text.KeywordsChecker(['暴力', '敏感'], aho_corasick=aho_corasick)
+        snapshot = checker.snapshot()
+        checker.add_keywords(['违法网站', '敏感词'])
+        checker.remove_keywords(['暴力', '不存在'])
+        self.assertEqual(checker.get_contained_keywords('暴力：如何根据敏感词过滤违法网站？', maximum_match=True),
+                         ['敏感词', '违法网站'])
+        self.assertEqual(snapshot.get_contained_keywords('暴力：如何根据敏感词过滤违法网站？', maximum_match=True),
+                         ['暴力', '敏感'])
+
+    def test_update(self):
+        self.do_test_update(False)
+        self.do_test_update(True)
+
+    def test_update_same_as_rebuild(self):
+        for i in range(100):
+            keywords = set(''.join('ab'[int(random() * 2)] for _ in range(1 + int(random() * 4))) for _ in range(4))
+            checker1 = utils.text.KeywordsChecker(keywords)
+            checker2 = utils.text.KeywordsChecker(keywords, aho_corasick=True)
+            for j in range(5):
+                changed_keywords = [''.join('ab'[int(random() * 2)] for _ in range(1 + int(random() * 4)))]
+                if random() < 0.5:
+                    checker1.add_keywords(changed_keywords)
+                    checker2.add_keywords(changed_keywords)
+                    keywords.update(changed_keywords)
+                else:
+                    checker1.remove_keywords(changed_keywords)
+                    checker2.remove_keywords(changed_keywords)
+                    keywords.difference_update(changed_keywords)
+            string = ''.join('ab'[int(random() * 2)] for _ in range(30))
+            expected = utils.text.KeywordsChecker(keywords).get_contained_keywords(string)
+            self.assertEqual(checker1.get_contained_keywords(string), expected)
+            self.assertEqual(checker2.get_contained_keywords(string), expected)
+
+    def test_snapshot_update_cost(self):
+        alphabet = 'abcdefghijklmnopqrstuvwxyz'
+        keywords = set(''.join(alphabet[int(random() * 26)] for _ in range(2 + int(random() * 5))) for _ in range(20000))
+        checker = utils.text.KeywordsChecker(keywords, aho_corasick=True)
+        # The first update builds the failure tree, which later snapshots share.
+        checker.add_keywords(['zzzzzz'])
+        keywords.add('zzzzzz')
+        for i in range(3):
+            snapshot = checker.snapshot()
+            changed_keywords = [''.join(alphabet[int(random() * 26)] for _ in range(3 + int(random() * 4)))
+                                for _ in range(10)]
+            checker.add_keywords(changed_keywords)
+            checker.remove_keywords(changed_keywords[:5])
+            keywords = keywords.union(changed_keywords).difference(changed_keywords[:5])
+            # Only the transitions and failure tree lists along the changes are copied.
+            automaton1, automaton2 = snapshot.automaton, checker.automaton
+            self.assertLess(sum(1 for t1, t2 in zip(automaton1.transitions, automaton2.transitions) if t1 is not t2),
+                            100)
+            self.assertLess(sum(1 for c1, c2 in zip(automaton1.fail_children, automaton2.fail_children)
+                                if c1 is not c2), 200)
+            string = ''.join(changed_keywords)
+            self.assertEqual(checker.get_contained_keywords(string),
+                             utils.text.KeywordsChecker(keywords).get_contained_keywords(string))
+
+    def test_update_compact(self):
+        checker = utils.text.KeywordsChecker(['暴力'], compact=True)
+        with self.assertRaises(TypeError):
+            checker.add_keywords(['敏感'])
+
+
+class KeywordsCheckerFileTest(unittest.TestCase):
+    def test_save_and_load(self):
+        path = 'test_keywords_checker.kwac'
+        for options in ({}, {'aho_corasick': True}, {'compact': True, 'punctuations_to_trim': ''}):
+            utils.text.KeywordsChecker(['暴力', '违法网站', '敏感', '敏感词'], **options).save(path)
+            for mmap in (False, True):
+                checker = utils.text.KeywordsChecker.load(path, mmap=mmap)
+                self.assertEqual(checker.contains_keywords('暴%力`是$不能解决问题的'), 'punctuations_to_trim' not in options)
+                self.assertEqual(checker.get_contained_keywords('如何根据敏感词过滤违法网站？'), ['敏感', '违法网站'])
+                checker = pickle.loads(pickle.dumps(checker))
+                self.assertEqual(checker.get_contained_keywords('如何根据敏感词过滤违法网站？', maximum_match=True),
+                                 ['敏感词', '违法网站'])
+        os.remove(path)
+
+    def test_load_invalid_file(self):
+        path = 'test_keywords_checker.kwac'
+        with open(path, 'wb') as file:
+            file.write(b'not a keywords checker file')
+        with self.assertRaises(ValueError):
+            utils.text.KeywordsChecker.load(path)
+        os.remove(path)
+
+
+class KeywordsCheckerBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.keywordsChecker = utils.text.KeywordsChecker(['暴力', '违法网站', '敏感', '敏感词'])
+        self.strings = ['孙子曰：兵者，国之大事', '暴%力`是$不能解决问题的', '', '警方查封了一#个*违-法+网=站'] * 25
+
+    def test_pickle(self):
+        checker = pickle.loads(pickle.dumps(self.keywordsChecker))
+        self.assertEqual(checker.get_contained_keywords('如何根据敏感词过滤违法网站？'), ['敏感', '违法网站'])
+
+    def test_check_many_in_process(self):
+        self.assertEqual(list(self.keywordsChecker.check_many(self.strings, workers=2, chunk_size=1000)),
+                         [self.keywordsChecker.contains_keywords(s) for s in self.strings])
+
+    def test_check_many_process_pool(self):
+        self.assertEqual(list(self.keywordsChecker.check_many(self.strings, workers=2, chunk_size=7)),
+                         [self.keywordsChecker.contains_keywords(s) for s in self.strings])
+
+    def test_check_many_chunk_size(self):
+        for chunk_size in (0, -1):
+            with self.assertRaises(ValueError):
+                self.keywordsChecker.check_many(self.strings, workers=2, chunk_size=chunk_size)
+            with self.assertRaises(ValueError):
+                self.keywordsChecker.mask_many(self.strings, chunk_size=chunk_size)
+
+
+class KeywordsCheckerMaskTest(unittest.TestCase):
+    def setUp(self):
+        self.keywordsChecker = utils.text.KeywordsChecker(['暴力', '违法网站', '敏感', '敏感词'])
+
+    def test_mask(self):
+        self.assertEqual(self.keywordsChecker.mask(''), '')
+        self.assertEqual(self.keywordsChecker.mask('孙子曰：兵者，国之大事'), '孙子曰：兵者，国之大事')
+        self.assertEqual(self.keywordsChecker.mask('如何根据敏感词过滤违-法+网=站？'), '如何根据***过滤*******？')
+        self.assertEqual(self.keywordsChecker.mask('如何根据敏感词过滤', '#', maximum_match=False), '如何根据##词过滤')
+
+    def test_mask_many(self):
+        strings = ['暴%力`是$不能解决问题的', '', '警方查封了一#个*违-法+网=站'] * 10
+        expected = [self.keywordsChecker.mask(string) for string in strings]
+        self.assertEqual(list(self.keywordsChecker.mask_many(strings)), expected)
+        self.assertEqual(list(self.keywordsChecker.mask_many(strings, workers=2, chunk_size=4)), expected)
+
 
 class EditDistanceTest(unittest.TestCase):
     def test_edit_distance_none(self):
@@ -99,3 +359,120 @@ class EditDistanceTest(unittest.TestCase):
         self.assertEqual(utils.text.edit_distance('new year', 'happy'), 7)
         self.assertEqual(utils.text.edit_distance('hello', '你好'), 5)
         self.assertEqual(utils.text.edit_distance('XX有限责任公司', 'XX有限公司'), 2)
+        # Sequences of unhashable elements fall back to dynamic programming.
+        self.assertEqual(utils.text.edit_distance([[1], [2]], [[1], [3]]), 1)
+        self.assertEqual(utils.text.edit_distance([[1], [2]], [[3], [4], [5]], max_distance=1), 2)
+        self.assertEqual(utils.text.weighted_edit_distance([[1], [2]], [[2]]), 1)
+
+    def test_edit_distance_bit_parallel(self):
+        self.assertEqual(utils.text.edit_distance_bit_parallel('', 'abc'), 3)
+        self.assertEqual(utils.text.edit_distance_bit_parallel('hello', '你好'), 5)
+        for i in range(200):
+            length1, length2 = int(random() * 150), int(random() * 150)
+            s1 = ''.join('abc'[int(random() * 3)] for _ in range(length1))
+            s2 = ''.join('abc'[int(random() * 3)] for _ in range(length2))
+            self.assertEqual(utils.text.edit_distance_bit_parallel(s1, s2), utils.text.edit_distance_dp(s1, s2))
+
+    def test_edit_distance_max_distance(self):
+        self.assertEqual(utils.text.edit_distance('hello', 'hello', max_distance=0), 0)
+        self.assertEqual(utils.text.edit_distance('happy', 'birthday', max_distance=2), 3)
+        self.assertEqual(utils.text.edit_distance('XX有限责任公司', 'XX有限公司', max_distance=2), 2)
+        self.assertEqual(utils.text.edit_distance('', 'abc', max_distance=1), 2)
+        for i in range(200):
+            length1, length2, max_distance = int(random() * 40), int(random() * 40), int(random() * 10)
+            s1 = ''.join('abc'[int(random() * 3)] for _ in range(length1))
+            s2 = ''.join('abc'[int(random() * 3)] for _ in range(length2))
+            expected = min(utils.text.edit_distance_dp(s1, s2), max_distance + 1)
+            self.assertEqual(utils.text.edit_distance_dp(s1, s2, max_distance), expected)
+            self.assertEqual(utils.text.edit_distance_bit_parallel(s1, s2, max_distance), expected)
+
+    def test_damerau_distance(self):
+        self.assertEqual(utils.text.damerau_distance('', 'abc'), 3)
+        self.assertEqual(utils.text.damerau_distance('hello', 'hlelo'), 1)
+        self.assertEqual(utils.text.damerau_distance('ca', 'abc'), 3)
+        self.assertEqual(utils.text.damerau_distance('有限责任公司', '有限任责公司', max_distance=0), 1)
+        for i in range(200):
+            length1, length2, max_distance = int(random() * 80), int(random() * 80), int(random() * 10)
+            s1 = ''.join('abc'[int(random() * 3)] for _ in range(length1))
+            s2 = ''.join('abc'[int(random() * 3)] for _ in range(length2))
+            # Doubled costs take the dynamic programming path.
+            expected = utils.text.weighted_edit_distance(s1, s2, 2, 2, 2, 2) // 2
+            self.assertEqual(utils.text.damerau_distance(s1, s2), expected)
+            self.assertEqual(utils.text.damerau_distance(s1, s2, max_distance), min(expected, max_distance + 1))
+
+    def test_weighted_edit_distance(self):
+        self.assertEqual(utils.text.weighted_edit_distance('hello', 'hell'), 1)
+        self.assertEqual(utils.text.weighted_edit_distance('hello', 'hell', delete_cost=3), 3)
+        self.assertEqual(utils.text.weighted_edit_distance('hell', 'hello', delete_cost=3), 1)
+        self.assertEqual(utils.text.weighted_edit_distance('hello', 'hallo', substitute_cost=3), 2)
+        self.assertEqual(utils.text.weighted_edit_distance('hello', 'hlelo', transpose_cost=0.5), 0.5)
+        self.assertEqual(utils.text.weighted_edit_distance('hello', 'world', 2, 2, 2, max_distance=5), 6)
+        # The distance exceeding max_distance is max_distance + 1 with fractional costs as well.
+        self.assertEqual(utils.text.weighted_edit_distance('a', 'b', substitute_cost=1.5, max_distance=1), 2)
+        self.assertEqual(utils.text.weighted_edit_distance('ab', 'ba', 5, 5, 1.5, max_distance=2.5), 3.5)
+        self.assertEqual(utils.text.weighted_edit_distance('ab', 'ba', 5, 5, 1.25, max_distance=2.5), 2.5)
+        for i in range(200):
+            length1, length2 = int(random() * 30), int(random() * 30)
+            s1 = ''.join('abc'[int(random() * 3)] for _ in range(length1))
+            s2 = ''.join('abc'[int(random() * 3)] for _ in range(length2))
+            self.assertEqual(utils.text.weighted_edit_distance(s1, s2, 3, 3, 3), 3 * utils.text.edit_distance(s1, s2))
+            expected = utils.text.weighted_edit_distance(s1, s2, 1, 2, 2)
+            self.assertEqual(utils.text.weighted_edit_distance(s2, s1, 2, 1, 2), expected)
+            self.assertEqual(utils.text.weighted_edit_distance(s1, s2, 1, 2, 2, max_distance=6), min(expected, 7))
+
+    def test_edit_distance_one_to_many(self):
+        candidates = ['hello', 'world', '', 'happy', '你好', 'hell']
+        expected = [utils.text.edit_distance_dp('hello', candidate) for candidate in candidates]
+        self.assertEqual(utils.text.edit_distance_one_to_many('hello', candidates), expected)
+        self.assertEqual(utils.text.edit_distance_one_to_many('', candidates), [len(c) for c in candidates])
+        self.assertEqual(utils.text.edit_distance_one_to_many('hello', []), [])
+        numpy, utils.text.numpy = utils.text._numpy(), None
+        try:
+            self.assertEqual(utils.text.edit_distance_one_to_many('hello', candidates), expected)
+        finally:
+            utils.text.numpy = numpy
+
+    def test_edit_distance_matrix(self):
+        a = [''.join('abc'[int(random() * 3)] for _ in range(int(random() * 10))) for _ in range(25)]
+        b = [''.join('abd'[int(random() * 3)] for _ in range(int(random() * 10))) for _ in range(15)]
+        expected = [[utils.text.edit_distance_dp(s1, s2) for s2 in b] for s1 in a]
+        for workers in (1, 2):
+            matrix = utils.text.edit_distance_matrix(a, b, workers=workers, tile_size=10)
+            self.assertEqual([list(row) for row in matrix], expected)
+        numpy, utils.text.numpy = utils.text._numpy(), None
+        try:
+            self.assertEqual(utils.text.edit_distance_matrix(a, b, tile_size=10), expected)
+        finally:
+            utils.text.numpy = numpy
+
+
+class BKTreeTest(unittest.TestCase):
+    def setUp(self):
+        self.strings = ['hello', 'hallo', 'help', 'world', 'word', 'happy', 'birthday', 'XX有限公司', 'XX有限责任公司']
+        self.tree = utils.text.BKTree(self.strings + ['hello'])
+
+    def test_bk_tree_empty(self):
+        tree = utils.text.BKTree()
+        self.assertEqual(len(tree), 0)
+        self.assertEqual(tree.search('hello', 2), [])
+        self.assertEqual(tree.nearest('hello', 2), [])
+
+    def test_bk_tree_search(self):
+        self.assertEqual(len(self.tree), len(self.strings))
+        self.assertEqual(self.tree.search('hello', 0), [(0, 'hello')])
+        self.assertEqual(self.tree.search('hell', 2), [(1, 'hello'), (1, 'help'), (2, 'hallo')])
+        self.assertEqual(self.tree.search('XX有限公司', 2), [(0, 'XX有限公司'), (2, 'XX有限责任公司')])
+
+    def test_bk_tree_nearest(self):
+        self.assertEqual(self.tree.nearest('wordl', 2), [(1, 'word'), (2, 'world')])
+        self.assertEqual(self.tree.nearest('wordl', 0), [])
+        self.assertEqual(self.tree.nearest('wordl', -1), [])
+        strings = [''.join('abc'[int(random() * 3)] for _ in range(int(random() * 8))) for _ in range(200)]
+        tree = utils.text.BKTree(strings)
+        for i in range(20):
+            query = ''.join('abc'[int(random() * 3)] for _ in range(int(random() * 8)))
+            expected = sorted(utils.text.edit_distance(query, string) for string in set(strings))[:5]
+            self.assertEqual([distance for distance, _ in tree.nearest(query, 5)], expected)
+            self.assertEqual(tree.search(query, 2),
+                             sorted((utils.text.edit_distance(query, string), string) for string in set(strings)
+                                    if utils.text.edit_distance(query, string) <= 2))
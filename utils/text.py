@@ -1,4 +1,431 @@
+from array import array
+from bisect import bisect_left
+from mmap import ACCESS_READ, mmap as memory_map
+import collections
+import heapq
+import itertools
+import multiprocessing
 import re
+import struct
+import sys
+
+# NumPy is optional, and imported on first use by _numpy as it takes most of the time to import this module.
+numpy = None
+_numpy_imported = False
+
+
+def _numpy():
+    """Return the numpy module, or None if it is not installed.
+    """
+    global numpy, _numpy_imported
+    if not _numpy_imported:
+        _numpy_imported = True
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+    return numpy
+
+
+#
+# Aho-Corasick automaton
+#
+
+class AhoCorasickAutomaton:
+    """Aho-Corasick automaton compiled from a keywords trie.
+
+    States are numbered in breadth-first order and the root is state 0. Each state keeps its goto transitions, its
+    failure link, its depth (the length of the prefix it represents), whether a keyword ends there and its output
+    link, which is the nearest state on the failure chain where a keyword ends (0 if there is none).
+    """
+
+    def __init__(self, keywords_trie):
+        """Compile the keywords trie built by KeywordsChecker.
+        """
+        self.transitions, self.fail, self.depth, self.terminal, self.output = [dict()], [0], [0], [False], [0]
+        # Set by KeywordsChecker.snapshot, a shared automaton is copied before it is updated.
+        self.shared = False
+        # States whose transitions dict is not shared with another automaton, None if all of them.
+        self.owned_states = None
+        # Children of each state in the failure tree and states reached by each char, built on the first update.
+        self.fail_children, self.char_states = None, None
+        # States whose failure tree children list and chars whose states list are not shared, None if all of them.
+        self.owned_children, self.owned_chars = None, None
+        # 1. Number the trie nodes in breadth-first order.
+        nodes, index = [keywords_trie], 0
+        while index < len(nodes):
+            node, state = nodes[index], index
+            for char, child in node.items():
+                if char is KeywordsChecker.END_OF_KEYWORD:
+                    continue
+                self.transitions[state][char] = len(nodes)
+                self.transitions.append(dict())
+                self.fail.append(0)
+                self.depth.append(self.depth[state] + 1)
+                self.terminal.append(child[KeywordsChecker.END_OF_KEYWORD])
+                self.output.append(0)
+                nodes.append(child)
+            index += 1
+        # 2. Calculate failure links and output links, parents always come before their children.
+        for state in range(len(self.transitions)):
+            for char, child in self.transitions[state].items():
+                if state != 0:
+                    self.fail[child] = self.step(self.fail[state], char)
+                fail = self.fail[child]
+                self.output[child] = fail if self.terminal[fail] else self.output[fail]
+
+    def step(self, state, char):
+        """Return the state after consuming the char, following failure links when there is no goto transition.
+        """
+        transitions, fail = self.transitions, self.fail
+        while True:
+            next_state = transitions[state].get(char)
+            if next_state is not None:
+                return next_state
+            if state == 0:
+                return 0
+            state = fail[state]
+
+    def keywords(self):
+        """Yield the keywords of the automaton.
+        """
+        stack = [(0, '')]
+        while stack:
+            state, prefix = stack.pop()
+            if self.terminal[state]:
+                yield prefix
+            for char, child in self.transitions[state].items():
+                stack.append((child, prefix + char))
+
+    def copy(self):
+        """Return a copy of the automaton.
+
+        The transitions dicts and the lists of the failure tree and char index are shared until they are updated, so
+        only the per-state lists are copied, which is a memory copy of references. They are kept flat rather than
+        chunked, as every char of a scan reads them.
+        """
+        automaton = AhoCorasickAutomaton.__new__(AhoCorasickAutomaton)
+        automaton.transitions, automaton.fail, automaton.depth = list(self.transitions), list(self.fail), list(self.depth)
+        automaton.terminal, automaton.output = list(self.terminal), list(self.output)
+        automaton.shared, automaton.owned_states = False, set()
+        automaton.fail_children, automaton.char_states, automaton.owned_children, automaton.owned_chars = \
+            None, None, None, None
+        if self.fail_children is not None:
+            automaton.fail_children, automaton.char_states = list(self.fail_children), dict(self.char_states)
+            automaton.owned_children, automaton.owned_chars = set(), set()
+        return automaton
+
+    def add(self, keyword):
+        """Add a keyword in place.
+
+        Only the new states and the states whose failure chains pass through them are updated.
+        """
+        transitions, fail, depth, terminal = self.transitions, self.fail, self.depth, self.terminal
+        if not keyword:
+            return
+        self.__index()
+        # 1. Follow the existing prefix of the keyword and append states for the rest of it.
+        state, new_states = 0, list()
+        for char in keyword:
+            child = transitions[state].get(char)
+            if child is None:
+                child = len(transitions)
+                self.__transitions(state)[char] = child
+                transitions.append(dict())
+                fail.append(0)
+                depth.append(depth[state] + 1)
+                terminal.append(False)
+                self.output.append(0)
+                self.fail_children.append(list())
+                if self.owned_children is not None:
+                    self.owned_children.add(child)
+                self.__states_of(char).append(child)
+                new_states.append((state, char, child))
+            state = child
+        if terminal[state]:
+            return
+        terminal[state] = True
+        touched_states = [state]
+        # 2. Calculate failure links of the new states, parents always come before their children. An existing state
+        # reached by the same char from a state whose failure chain passes through the parent may now fail to the
+        # new state instead.
+        for parent, char, child in new_states:
+            fail[child] = 0 if parent == 0 else self.step(fail[parent], char)
+            self.__children(fail[child]).append(child)
+            if parent == 0:
+                candidates = self.char_states[char]
+            else:
+                candidates = [transitions[s][char] for s in self.__fail_subtree(parent) if char in transitions[s]]
+            # New states with greater numbers are not processed yet.
+            for candidate in candidates:
+                if candidate < child and depth[fail[candidate]] < depth[child]:
+                    self.__move(candidate, child)
+                    touched_states.append(candidate)
+            touched_states.append(child)
+        # 3. Update output links below all the changed states.
+        for state in touched_states:
+            self.__update_outputs(state)
+
+    def remove(self, keyword):
+        """Remove a keyword in place. States are kept, only the keyword end is cleared.
+        """
+        state = 0
+        for char in keyword:
+            state = self.transitions[state].get(char)
+            if state is None:
+                return
+        if state == 0 or not self.terminal[state]:
+            return
+        self.__index()
+        self.terminal[state] = False
+        self.__update_outputs(state)
+
+    def __index(self):
+        """Build the failure tree and the states reached by each char.
+        """
+        if self.fail_children is not None:
+            return
+        self.fail_children, self.char_states = [list() for _ in range(len(self.fail))], dict()
+        self.owned_children, self.owned_chars = None, None
+        for state in range(1, len(self.fail)):
+            self.fail_children[self.fail[state]].append(state)
+        for transitions in self.transitions:
+            for char, child in transitions.items():
+                self.char_states.setdefault(char, list()).append(child)
+
+    def __transitions(self, state):
+        """Return the transitions dict of the state for writing, copying it first if it is shared.
+        """
+        if self.owned_states is not None and state not in self.owned_states:
+            self.transitions[state] = dict(self.transitions[state])
+            self.owned_states.add(state)
+        return self.transitions[state]
+
+    def __children(self, state):
+        """Return the children list of the state in the failure tree for writing, copying it first if it is shared.
+        """
+        if self.owned_children is not None and state not in self.owned_children:
+            self.fail_children[state] = list(self.fail_children[state])
+            self.owned_children.add(state)
+        return self.fail_children[state]
+
+    def __states_of(self, char):
+        """Return the list of states reached by the char for writing, copying it first if it is shared.
+        """
+        if self.owned_chars is not None and char not in self.owned_chars:
+            self.char_states[char] = list(self.char_states.get(char, ()))
+            self.owned_chars.add(char)
+        return self.char_states.setdefault(char, list())
+
+    def __move(self, state, fail):
+        """Change the failure link of the state.
+        """
+        self.__children(self.fail[state]).remove(state)
+        self.fail[state] = fail
+        self.__children(fail).append(state)
+
+    def __fail_subtree(self, state):
+        """Yield the state and the states whose failure chains pass through it.
+        """
+        stack = [state]
+        while stack:
+            state = stack.pop()
+            yield state
+            stack.extend(self.fail_children[state])
+
+    def __update_outputs(self, state):
+        """Recalculate output links of the states whose failure chains pass through the state.
+        """
+        fail, terminal, output = self.fail, self.terminal, self.output
+        for state in self.__fail_subtree(state):
+            if state != 0:
+                output[state] = fail[state] if terminal[fail[state]] else output[fail[state]]
+
+    def contains(self, string):
+        """Return True if any keyword occurs in the string.
+        """
+        step, terminal, output, state = self.step, self.terminal, self.output, 0
+        for char in string:
+            state = step(state, char)
+            if terminal[state] or output[state] != 0:
+                return True
+        return False
+
+    def find(self, string, maximum_match=False):
+        """Return [(begin, end)] of the non-overlapping matches in the string, selected the same way as scan.
+        """
+        return list(self.__find(string, maximum_match))
+
+    def scan(self, chunks, maximum_match=False, skipped_chars=frozenset()):
+        """Yield (begin, end, keyword) of the non-overlapping matches in the text made of the chunks from left to right.
+
+        Matches are selected the same way as KeywordsChecker: the leftmost keyword wins, and the shortest (or the
+        longest if maximum_match is True) keyword is taken when several keywords begin at the same position. Skipped
+        chars are ignored like they were removed from the text, while begin and end are offsets in the whole text
+        including them. The automaton state is carried across chunks, and memory use is bounded by the chunk size and
+        the longest keyword.
+        """
+        trim_pattern = None
+        if skipped_chars:
+            trim_pattern = re.compile('[{0}]'.format(''.join([re.escape(c) for c in sorted(skipped_chars)])))
+        max_depth = max(self.depth)
+        # Positions count kept chars only. The kept chars from position base on are kept in text, no match begins more
+        # than max_depth positions before the last consumed one. The i-th removed char was right before the kept char
+        # at position (its offset - i), see KeywordsChecker.find_keywords, and removed chars before any match to come
+        # are only counted.
+        text, base, offset, removed, removed_count = '', 0, 0, collections.deque(), 0
+
+        def kept_chars():
+            nonlocal text, base, offset, removed_count
+            for chunk in chunks:
+                if not isinstance(chunk, str):
+                    raise TypeError('Chunks must be str, not {0}'.format(type(chunk).__name__))
+                if trim_pattern is not None:
+                    for match in trim_pattern.finditer(chunk):
+                        removed.append(offset + match.start() - removed_count - len(removed))
+                    offset += len(chunk)
+                    chunk = trim_pattern.sub('', chunk)
+                position = base + len(text)
+                while removed and removed[0] <= position - max_depth:
+                    removed.popleft()
+                    removed_count += 1
+                text = text[len(text) - min(max_depth, len(text)):] + chunk
+                base = position + len(chunk) - len(text)
+                yield from chunk
+
+        for begin, end in self.__find(kept_chars(), maximum_match):
+            keyword = text[begin - base: end - base]
+            while removed and removed[0] <= begin:
+                removed.popleft()
+                removed_count += 1
+            original_begin = begin + removed_count
+            while removed and removed[0] < end:
+                removed.popleft()
+                removed_count += 1
+            yield original_begin, end + removed_count, keyword
+
+    def __find(self, chars, maximum_match):
+        """Yield (begin, end) of the non-overlapping matches in the chars, see scan.
+
+        Pending begins are kept in a heap, and the output chain is walked only until a match which wins over all the
+        rest of the chain.
+        """
+        step, depth, terminal, output = self.step, self.depth, self.terminal, self.output
+        state, cursor, pending, begins, end = 0, 0, dict(), list(), 0
+        # Every match found later begins at or after the horizon, the leftmost pending match beginning before it is
+        # taken. Without maximum_match, one beginning at the horizon is taken too, as later ones beginning there are
+        # longer.
+        lag = 0 if maximum_match else 1
+        for char in chars:
+            end += 1
+            state = step(state, char)
+            match = state if terminal[state] else output[state]
+            while match != 0:
+                begin = end - depth[match]
+                if begin >= cursor:
+                    if not begins and not maximum_match and (begin == cursor or begin == end - depth[state]):
+                        # Nothing pending and no later match can begin before it, the rest of the chain begins later.
+                        cursor = end
+                        yield begin, end
+                        break
+                    if begin not in pending:
+                        pending[begin] = end
+                        heapq.heappush(begins, begin)
+                    elif maximum_match:
+                        pending[begin] = end
+                    # The rest of the chain begins later and ends here. If this match is the leftmost pending one and
+                    # ends here too, either it is taken or a later match beginning before it is, and both end after
+                    # the rest of the chain begins.
+                    if begins[0] == begin and pending[begin] == end:
+                        break
+                match = output[match]
+            if begins:
+                # Matches beginning before the cursor are never taken.
+                horizon = end - depth[state] if end - depth[state] > cursor else cursor
+                horizon += lag
+                while begins and begins[0] < horizon:
+                    begin = heapq.heappop(begins)
+                    if begin >= cursor:
+                        cursor = pending[begin]
+                        yield begin, cursor
+                    del pending[begin]
+                while begins and begins[0] < cursor:
+                    del pending[heapq.heappop(begins)]
+        while begins:
+            begin = heapq.heappop(begins)
+            if begin >= cursor:
+                cursor = pending[begin]
+                yield begin, cursor
+
+
+class CompactAhoCorasickAutomaton(AhoCorasickAutomaton):
+    """Aho-Corasick automaton stored in flat arrays instead of one dict per state.
+
+    States are numbered in breadth-first order while children are sorted by char, so the children of a state are
+    consecutive states and no target array is needed: the edges of state s are edge_chars[edge_offsets[s]:
+    edge_offsets[s + 1]] (code points in ascending order), and the edge with index i leads to state i + 1.
+    """
+
+    def __init__(self, keywords):
+        """Build from keywords directly, without a keywords trie.
+        """
+        # Path of the file when the arrays are memory-mapped, see KeywordsChecker.load.
+        self.path = None
+        keywords = sorted(set(keywords))
+        self.edge_offsets, self.edge_chars = array('I', [0]), array('I')
+        self.depth, self.terminal = array('I'), bytearray()
+        # 1. Each state covers a range of the sorted keywords sharing the same prefix.
+        ranges = collections.deque([(0, len(keywords), 0)])
+        while ranges:
+            begin, end, depth = ranges.popleft()
+            self.depth.append(depth)
+            # The keyword equal to the shared prefix comes first. The root is never terminal, an empty keyword never
+            # matches.
+            terminal = begin < end and len(keywords[begin]) == depth
+            self.terminal.append(terminal and depth > 0)
+            if terminal:
+                begin += 1
+            while begin < end:
+                char, next_begin = keywords[begin][depth], begin + 1
+                while next_begin < end and keywords[next_begin][depth] == char:
+                    next_begin += 1
+                self.edge_chars.append(ord(char))
+                ranges.append((begin, next_begin, depth + 1))
+                begin = next_begin
+            self.edge_offsets.append(len(self.edge_chars))
+        # 2. Calculate failure links and output links, parents always come before their children.
+        self.fail, self.output = array('I', [0]) * len(self.depth), array('I', [0]) * len(self.depth)
+        for state in range(len(self.depth)):
+            for edge in range(self.edge_offsets[state], self.edge_offsets[state + 1]):
+                child = edge + 1
+                if state != 0:
+                    self.fail[child] = self.step(self.fail[state], chr(self.edge_chars[edge]))
+                fail = self.fail[child]
+                self.output[child] = fail if self.terminal[fail] else self.output[fail]
+
+    def step(self, state, char):
+        """Return the state after consuming the char, following failure links when there is no goto transition.
+        """
+        edge_offsets, edge_chars, fail, code = self.edge_offsets, self.edge_chars, self.fail, ord(char)
+        while True:
+            begin, end = edge_offsets[state], edge_offsets[state + 1]
+            edge = bisect_left(edge_chars, code, begin, end)
+            if edge < end and edge_chars[edge] == code:
+                return edge + 1
+            if state == 0:
+                return 0
+            state = fail[state]
+
+    def keywords(self):
+        """Yield the keywords of the automaton.
+        """
+        stack = [(0, '')]
+        while stack:
+            state, prefix = stack.pop()
+            if self.terminal[state]:
+                yield prefix
+            for edge in range(self.edge_offsets[state], self.edge_offsets[state + 1]):
+                stack.append((edge + 1, prefix + chr(self.edge_chars[edge])))
 
 
 #
@@ -11,9 +438,28 @@ class KeywordsChecker:
 
     END_OF_KEYWORD = object()
 
-    def __init__(self, keywords, punctuations_to_trim=' \t\r\n`~!@#$%^&*()-_=+[{]}\\|;:\'",<.>/?｀～！＃¥％…＊（）－—＝＋［｛］｝、｜；：‘’“”，《。》／？'):
+    # Binary file layout of a saved checker, all integers are little-endian unsigned 32-bit:
+    # 1. Header: magic, version, states count, edges count, length of the UTF-8 encoded punctuations to trim.
+    # 2. Punctuations to trim, padded with zeros to a multiple of 4 bytes.
+    # 3. Arrays of the compact automaton: edge_offsets, edge_chars, depth, fail, output and terminal (1 byte each).
+    FILE_MAGIC, FILE_VERSION, FILE_HEADER = b'KWAC', 2, struct.Struct('<4sIIII')
+
+    def __init__(self, keywords, punctuations_to_trim=' \t\r\n`~!@#$%^&*()-_=+[{]}\\|;:\'",<.>/?｀～！＃¥％…＊（）－—＝＋［｛］｝、｜；：‘’“”，《。》／？',
+                 aho_corasick=False, compact=False):
         """Initialize with keywords.
+
+        If aho_corasick is True, the keywords trie is compiled into an Aho-Corasick automaton and the string is
+        scanned in a single linear pass instead of restarting a trie walk from every position. It pays off with long
+        keywords sharing prefixes and on text with few matches, while the trie walk is faster on text dense with short
+        matches.
+
+        If compact is True, an array backed Aho-Corasick automaton is built directly from the keywords and no keywords
+        trie is kept, which takes a small fraction of the memory of the dict based structures.
         """
+        self.__set_punctuations_to_trim(punctuations_to_trim)
+        if compact:
+            self.keywords_trie, self.automaton = None, CompactAhoCorasickAutomaton(keywords)
+            return
         self.keywords_trie = dict()
         for keyword in keywords:
             current_node = self.keywords_trie
@@ -26,18 +472,106 @@ class KeywordsChecker:
                 else:
                     current_node = current_node[char]
             current_node[KeywordsChecker.END_OF_KEYWORD] = True
+        self.automaton = AhoCorasickAutomaton(self.keywords_trie) if aho_corasick else None
+
+    def __set_punctuations_to_trim(self, punctuations_to_trim):
+        self.punctuations_to_trim = frozenset(punctuations_to_trim or '')
+        self.trim_pattern = None
         if punctuations_to_trim:
             self.trim_pattern = re.compile('[{0}]'.format(''.join([re.escape(c) for c in punctuations_to_trim])))
-        else:
-            self.trim_pattern = None
+
+    def __getstate__(self):
+        """Pickle the compiled automaton instead of the keywords trie, whose END_OF_KEYWORD keys do not survive
+        pickling. Memory-mapped checkers are pickled by path so that unpickled copies map the same file.
+        """
+        if isinstance(self.automaton, CompactAhoCorasickAutomaton) and self.automaton.path is not None:
+            return {'path': self.automaton.path}
+        state = self.__dict__.copy()
+        if state['automaton'] is None:
+            state['automaton'] = AhoCorasickAutomaton(self.keywords_trie)
+        state['keywords_trie'] = None
+        return state
+
+    def __setstate__(self, state):
+        if 'path' in state:
+            state = KeywordsChecker.load(state['path']).__dict__
+        self.__dict__.update(state)
+
+    def save(self, path):
+        """Save the compiled checker to a binary file, which can be loaded quickly with load.
+        """
+        automaton = self.automaton
+        if automaton is None:
+            automaton = AhoCorasickAutomaton(self.keywords_trie)
+        if not isinstance(automaton, CompactAhoCorasickAutomaton):
+            automaton = CompactAhoCorasickAutomaton(automaton.keywords())
+        punctuations = ''.join(sorted(self.punctuations_to_trim)).encode('utf-8')
+        with open(path, 'wb') as file:
+            file.write(KeywordsChecker.FILE_HEADER.pack(KeywordsChecker.FILE_MAGIC, KeywordsChecker.FILE_VERSION,
+                                                        len(automaton.depth), len(automaton.edge_chars),
+                                                        len(punctuations)))
+            file.write(punctuations + bytes(-len(punctuations) % 4))
+            for data in (automaton.edge_offsets, automaton.edge_chars, automaton.depth, automaton.fail,
+                         automaton.output):
+                data = array('I', data)
+                if sys.byteorder == 'big':
+                    data.byteswap()
+                file.write(data.tobytes())
+            file.write(bytes(automaton.terminal))
+
+    @staticmethod
+    def load(path, mmap=True):
+        """Load a checker saved by save.
+
+        If mmap is True, the automaton is memory-mapped instead of copied, so loading takes no time regardless of the
+        keywords count and all processes loading the same file share one copy of the pages.
+        """
+        mmap = mmap and sys.byteorder == 'little'
+        with open(path, 'rb') as file:
+            buffer = memoryview(memory_map(file.fileno(), 0, access=ACCESS_READ) if mmap else file.read())
+        if len(buffer) < KeywordsChecker.FILE_HEADER.size:
+            raise ValueError('Not a keywords checker file: {0}'.format(path))
+        magic, version, states_count, edges_count, punctuations_length = KeywordsChecker.FILE_HEADER.unpack_from(buffer)
+        if magic != KeywordsChecker.FILE_MAGIC:
+            raise ValueError('Not a keywords checker file: {0}'.format(path))
+        if version != KeywordsChecker.FILE_VERSION:
+            raise ValueError('Unsupported keywords checker file version {0}: {1}'.format(version, path))
+        offset = KeywordsChecker.FILE_HEADER.size
+        punctuations = bytes(buffer[offset: offset + punctuations_length]).decode('utf-8')
+        offset += punctuations_length + (-punctuations_length % 4)
+        if len(buffer) != offset + (states_count * 4 + 1 + edges_count) * 4 + states_count:
+            raise ValueError('Truncated keywords checker file: {0}'.format(path))
+        automaton = CompactAhoCorasickAutomaton.__new__(CompactAhoCorasickAutomaton)
+        automaton.path = path if mmap else None
+        for name, count in (('edge_offsets', states_count + 1), ('edge_chars', edges_count), ('depth', states_count),
+                            ('fail', states_count), ('output', states_count)):
+            data = buffer[offset: offset + count * 4]
+            if mmap:
+                data = data.cast('I')
+            else:
+                data = array('I', bytes(data))
+                if sys.byteorder == 'big':
+                    data.byteswap()
+            setattr(automaton, name, data)
+            offset += count * 4
+        automaton.terminal = buffer[offset: offset + states_count]
+        if not mmap:
+            automaton.terminal = bytearray(automaton.terminal)
+        checker = KeywordsChecker.__new__(KeywordsChecker)
+        checker.__set_punctuations_to_trim(punctuations)
+        checker.keywords_trie, checker.automaton = None, automaton
+        return checker
 
     def contains_keywords(self, string):
         """Return True if the string contains any of the keywords, False otherwise.
         """
         if self.trim_pattern:
             string = self.trim_pattern.sub('', string)
+        if self.automaton is not None:
+            return self.automaton.contains(string)
+        keywords_trie = self.keywords_trie
         for position in range(len(string)):
-            if self.__calculate_matching_length(string, position, True) > 0:
+            if self.__calculate_matching_length(keywords_trie, string, position, True) > 0:
                 return True
         return False
 
@@ -46,9 +580,11 @@ class KeywordsChecker:
         """
         if self.trim_pattern:
             string = self.trim_pattern.sub('', string)
-        contained_keywords, length, position = list(), len(string), 0
+        if self.automaton is not None:
+            return [string[begin: end] for begin, end in self.__find_matches(string, maximum_match)]
+        keywords_trie, contained_keywords, length, position = self.keywords_trie, list(), len(string), 0
         while position < length:
-            matching_length = self.__calculate_matching_length(string, position, maximum_match)
+            matching_length = self.__calculate_matching_length(keywords_trie, string, position, maximum_match)
             if matching_length == 0:
                 position += 1
             else:
@@ -56,10 +592,216 @@ class KeywordsChecker:
                 position += matching_length
         return contained_keywords
 
-    def __calculate_matching_length(self, string, begin, maximum_match):
+    def find_keywords(self, string, maximum_match=False):
+        """Yield (begin, end, keyword) of the contained keywords of the string.
+
+        Begin and end are offsets of the original string, and string[begin: end] is the keyword with the punctuations to
+        trim in between. The offsets of the punctuations to trim are collected, the string is matched without them as
+        get_contained_keywords does, and only the offsets of the matches are mapped back.
+        """
+        trimmed_string, shifts = string, None
+        if self.trim_pattern:
+            # The i-th removed char was right before the char now at offset (its offset - i) of the trimmed string.
+            shifts = [match.start() - i for i, match in enumerate(self.trim_pattern.finditer(string))]
+            if shifts:
+                trimmed_string = self.trim_pattern.sub('', string)
+        matches = self.__find_matches(trimmed_string, maximum_match)
+        if not shifts:
+            for begin, end in matches:
+                yield begin, end, trimmed_string[begin: end]
+            return
+        # Matches are in order, so the removed chars before them are counted in one pass.
+        removed, removed_count = 0, len(shifts)
+        for begin, end in matches:
+            while removed < removed_count and shifts[removed] <= begin:
+                removed += 1
+            original_begin = begin + removed
+            while removed < removed_count and shifts[removed] < end:
+                removed += 1
+            yield original_begin, end + removed, trimmed_string[begin: end]
+
+    def matching_length(self, string, begin=0, maximum_match=True):
+        """Return the length of the longest (or the shortest if maximum_match is False) keyword which string[begin:]
+        starts with, 0 if there is none.
+
+        Punctuations to trim are not skipped. The keywords trie is walked if the checker keeps one, otherwise the goto
+        transitions of the automaton, so a pickled or loaded checker matches the same.
+        """
+        if self.keywords_trie is not None:
+            return self.__calculate_matching_length(self.keywords_trie, string, begin, maximum_match)
+        automaton, state, matching_length = self.automaton, 0, 0
+        depth, terminal = automaton.depth, automaton.terminal
+        for position in range(begin, len(string)):
+            next_state = automaton.step(state, string[position])
+            # Only a goto transition leads one char deeper, a failure link never does.
+            if depth[next_state] != depth[state] + 1:
+                break
+            state = next_state
+            if terminal[state]:
+                matching_length = position - begin + 1
+                if not maximum_match:
+                    break
+        return matching_length
+
+    def scan_stream(self, stream, maximum_match=False, chunk_size=65536):
+        """Yield (begin, end, keyword) of the contained keywords of a file object or an iterable of text chunks.
+
+        Begin and end are offsets of the whole stream, punctuations to trim are skipped but counted. Keywords spanning
+        chunk boundaries are matched, and memory use is bounded by the chunk size and the longest keyword. A checker
+        without an automaton compiles one for each call. Files must be opened in text mode, bytes chunks raise
+        TypeError.
+        """
+        if hasattr(stream, 'read'):
+            read = stream.read
+            stream = iter(lambda: read(chunk_size) or None, None)
+        automaton = self.automaton if self.automaton is not None else AhoCorasickAutomaton(self.keywords_trie)
+        return automaton.scan(stream, maximum_match, self.punctuations_to_trim)
+
+    def add_keywords(self, keywords):
+        """Add keywords in place without rebuilding the checker.
+
+        The update cost depends on the added keywords rather than all the keywords. Nodes of the keywords trie are
+        copied along the changed paths instead of being modified, so scans in progress keep their view. An automaton
+        shared with a snapshot is copied on the first update after the snapshot, and its transitions and failure tree
+        are shared with the snapshot until they change. The failure tree is built once, on the first update.
+        """
+        self.__update(keywords, True)
+
+    def remove_keywords(self, keywords):
+        """Remove keywords in place without rebuilding the checker, see add_keywords.
+        """
+        self.__update(keywords, False)
+
+    def snapshot(self):
+        """Return a checker with the current keywords, which is not affected by later add_keywords or remove_keywords.
+        """
+        if isinstance(self.automaton, CompactAhoCorasickAutomaton):
+            raise TypeError('Compact keywords checker is read-only')
+        if self.automaton is not None:
+            self.automaton.shared = True
+        checker = KeywordsChecker.__new__(KeywordsChecker)
+        checker.__dict__.update(self.__dict__)
+        return checker
+
+    def __update(self, keywords, add):
+        """Add or remove keywords in place.
+        """
+        if isinstance(self.automaton, CompactAhoCorasickAutomaton):
+            raise TypeError('Compact keywords checker is read-only')
+        keywords = list(keywords)
+        if self.keywords_trie is not None:
+            # Copy each node on the changed paths once, then publish the new root.
+            keywords_trie, copied_nodes = dict(self.keywords_trie), set()
+            copied_nodes.add(id(keywords_trie))
+            for keyword in keywords:
+                path, current_node = [keywords_trie], keywords_trie
+                for char in keyword:
+                    if char not in current_node:
+                        if not add:
+                            break
+                        new_node = dict()
+                        new_node[KeywordsChecker.END_OF_KEYWORD] = False
+                    elif id(current_node[char]) not in copied_nodes:
+                        new_node = dict(current_node[char])
+                    else:
+                        new_node = current_node[char]
+                    copied_nodes.add(id(new_node))
+                    current_node[char] = new_node
+                    current_node = new_node
+                    path.append(current_node)
+                else:
+                    if keyword:
+                        current_node[KeywordsChecker.END_OF_KEYWORD] = add
+                    # Prune nodes which no longer lead to any keyword.
+                    for i in range(len(keyword), 0, -1):
+                        if path[i][KeywordsChecker.END_OF_KEYWORD] or len(path[i]) > 1:
+                            break
+                        del path[i - 1][keyword[i - 1]]
+            self.keywords_trie = keywords_trie
+        if self.automaton is not None:
+            automaton = self.automaton.copy() if self.automaton.shared else self.automaton
+            for keyword in keywords:
+                if add:
+                    automaton.add(keyword)
+                else:
+                    automaton.remove(keyword)
+            self.automaton = automaton
+
+    def check_many(self, strings, workers=1, chunk_size=1000):
+        """Yield contains_keywords result of each string in order.
+
+        Strings are checked in chunks of (chunk_size) by (workers) processes, the compiled automaton is shipped to each
+        worker once when the pool starts. Batches no longer than one chunk are checked in process.
+        """
+        return self.__map('contains_keywords', strings, workers, chunk_size)
+
+    def mask(self, string, replacement='*', maximum_match=True):
+        """Return the string with every char of the contained keywords replaced by the replacement.
+
+        Punctuations to trim inside a keyword are replaced as well, so '违-法+网=站' becomes '*******'. The output is
+        joined from one list of segments in a single pass.
+        """
+        segments, position = list(), 0
+        for begin, end, _ in self.find_keywords(string, maximum_match):
+            segments.append(string[position: begin])
+            segments.append(replacement * (end - begin))
+            position = end
+        if position == 0:
+            return string
+        segments.append(string[position:])
+        return ''.join(segments)
+
+    def mask_many(self, strings, replacement='*', maximum_match=True, workers=1, chunk_size=1000):
+        """Yield mask result of each string in order, see check_many for workers and chunk_size.
+        """
+        return self.__map('mask', strings, workers, chunk_size, replacement, maximum_match)
+
+    def __map(self, method, strings, workers, chunk_size, *args):
+        """Return an iterator of results of calling the method on each string in order, see __map_chunks.
+        """
+        if chunk_size < 1:
+            raise ValueError('Chunk size must be positive: {0}'.format(chunk_size))
+        return self.__map_chunks(method, iter(strings), workers, chunk_size, args)
+
+    def __map_chunks(self, method, strings, workers, chunk_size, args):
+        """Yield results of calling the method on each string in order, in process or in a process pool.
+        """
+        chunk = list(itertools.islice(strings, chunk_size))
+        if workers <= 1 or len(chunk) < chunk_size:
+            call = getattr(self, method)
+            for string in itertools.chain(chunk, strings):
+                yield call(string, *args)
+            return
+        with multiprocessing.Pool(workers, initializer=_initialize_worker, initargs=(self,)) as pool:
+            # Keep a bounded number of chunks in flight so that the input is consumed lazily.
+            pending = collections.deque()
+            while chunk:
+                pending.append(pool.apply_async(_run_worker, (method, chunk, args)))
+                if len(pending) >= workers * 2:
+                    yield from pending.popleft().get()
+                chunk = list(itertools.islice(strings, chunk_size))
+            while pending:
+                yield from pending.popleft().get()
+
+    def __find_matches(self, string, maximum_match):
+        """Return [(begin, end)] of the contained keywords of the string without punctuations to trim.
+        """
+        if self.automaton is not None:
+            return self.automaton.find(string, maximum_match)
+        keywords_trie, matches, length, position = self.keywords_trie, list(), len(string), 0
+        while position < length:
+            matching_length = self.__calculate_matching_length(keywords_trie, string, position, maximum_match)
+            if matching_length == 0:
+                position += 1
+            else:
+                matches.append((position, position + matching_length))
+                position += matching_length
+        return matches
+
+    def __calculate_matching_length(self, keywords_trie, string, begin, maximum_match):
         """Check if a substring from the begin position matches any of the keywords and return the matching length.
         """
-        current_node, matching_length = self.keywords_trie, 0
+        current_node, matching_length = keywords_trie, 0
         for position in range(begin, len(string)):
             char = string[position]
             if char not in current_node:
@@ -72,19 +814,56 @@ class KeywordsChecker:
         return matching_length
 
 
+# Keywords checker of a worker process, see KeywordsChecker.check_many.
+_worker_checker = None
+
+
+def _initialize_worker(checker):
+    global _worker_checker
+    _worker_checker = checker
+
+
+def _run_worker(method, strings, args):
+    call = getattr(_worker_checker, method)
+    return [call(string, *args) for string in strings]
+
+
 #
 # Edit distance.
 #
 
-def edit_distance(s1, s2):
+def edit_distance(s1, s2, max_distance=None):
     """Return edit distance (Levenshtein distance) between s1 and s2.
+
+    If max_distance is specified, the calculation stops as soon as the distance is known to exceed it, and
+    max_distance + 1 is returned in that case.
+
+    Sequences of hashable elements, e.g. strings, are compared by edit_distance_bit_parallel, and other sequences (e.g.
+    of lists) by edit_distance_dp.
+    """
+    try:
+        return edit_distance_bit_parallel(s1, s2, max_distance)
+    except TypeError:
+        # The elements are unhashable, or the arguments are not sequences, which edit_distance_dp reports as well.
+        return edit_distance_dp(s1, s2, max_distance)
+
+
+def edit_distance_dp(s1, s2, max_distance=None):
+    """Return edit distance between s1 and s2 by dynamic programming, the reference implementation.
+
+    If max_distance is specified, only the diagonal band of width 2 * max_distance + 1 is calculated (Ukkonen's
+    cut-off), and max_distance + 1 is returned as soon as a whole row exceeds max_distance.
     """
     len1, len2 = len(s1), len(s2)
+    if max_distance is not None and abs(len1 - len2) > max_distance:
+        return max_distance + 1
     if len1 == 0 or len2 == 0:
         return max(len1, len2)
     # Space complexity is O(min(len(s1), len(s2)))
     if len1 < len2:
         s1, s2, len1, len2 = s2, s1, len2, len1
+    if max_distance is not None:
+        return __edit_distance_band(s1, s2, max_distance)
     d0, d1 = [x for x in range(len2 + 1)], [0 for _ in range(len2 + 1)]
     # Time complexity is O(len(s1) * len(s2))
     for i in range(len1):
@@ -96,3 +875,343 @@ def edit_distance(s1, s2):
                 d1[j + 1] = min(d0[j] + 1, d0[j + 1] + 1, d1[j] + 1)
         d0, d1 = d1, d0
     return d0[len2]
+
+
+def __edit_distance_band(s1, s2, max_distance):
+    """Banded dynamic programming for edit_distance_dp, len(s1) >= len(s2) > 0.
+    """
+    len1, len2, exceeded = len(s1), len(s2), max_distance + 1
+    # Cells out of the band are never less than exceeded.
+    d0, d1 = [min(x, exceeded) for x in range(len2 + 1)], [exceeded for _ in range(len2 + 1)]
+    # Time complexity is O(len(s1) * max_distance)
+    for i in range(len1):
+        begin, end = max(1, i + 1 - max_distance), min(len2, i + 1 + max_distance)
+        d1[begin - 1] = min(i + 1, exceeded) if begin == 1 else exceeded
+        row_min = d1[begin - 1]
+        for j in range(begin - 1, end):
+            if s1[i] == s2[j]:
+                d = d0[j]
+            else:
+                d = min(d0[j] + 1, d0[j + 1] + 1, d1[j] + 1)
+            d1[j + 1] = d
+            if d < row_min:
+                row_min = d
+        if row_min >= exceeded:
+            return exceeded
+        if end < len2:
+            d1[end + 1] = exceeded
+        d0, d1 = d1, d0
+    return min(d0[len2], exceeded)
+
+
+def edit_distance_bit_parallel(s1, s2, max_distance=None):
+    """Return edit distance between s1 and s2 by Myers' bit-parallel algorithm (in Hyyro's formulation).
+
+    A column of the dynamic programming matrix is encoded as bit vectors of vertical deltas, with one bit for each char
+    of the shorter string, and computed with a constant number of integer operations. Python ints have no fixed width,
+    so a string longer than a machine word is processed in word sized blocks by the int arithmetic.
+
+    If max_distance is specified, max_distance + 1 is returned as soon as the distance is known to exceed it.
+    """
+    return __bit_parallel_distance(s1, s2, max_distance, False)
+
+
+def damerau_distance(s1, s2, max_distance=None):
+    """Return Damerau distance between s1 and s2, in which transposing two adjacent chars is also an edit.
+
+    This is the optimal string alignment distance, i.e. no substring is edited more than once, calculated by Hyyro's
+    bit-parallel extension of edit_distance_bit_parallel. max_distance is the same as edit_distance.
+    """
+    return __bit_parallel_distance(s1, s2, max_distance, True)
+
+
+def weighted_edit_distance(s1, s2, insert_cost=1, delete_cost=1, substitute_cost=1, transpose_cost=None,
+                           max_distance=None):
+    """Return the least total cost of edits transforming s1 into s2.
+
+    Insertions (of a char of s2), deletions (of a char of s1) and substitutions are weighted by their costs, adjacent
+    transpositions are also edits if transpose_cost is specified (see damerau_distance). Costs are non-negative numbers.
+    max_distance is the same as edit_distance.
+
+    Unit costs of hashable elements are calculated by the bit-parallel algorithms, other costs by dynamic programming in
+    O(min(len(s1), len(s2))) space, which stops as soon as the last calculated rows all exceed max_distance.
+    """
+    if insert_cost == delete_cost == substitute_cost == 1 and transpose_cost in (None, 1):
+        try:
+            return __bit_parallel_distance(s1, s2, max_distance, transpose_cost is not None)
+        except TypeError:
+            # Unhashable elements are compared by the dynamic programming below.
+            pass
+    len1, len2 = len(s1), len(s2)
+    # Space complexity is O(min(len(s1), len(s2))), transforming s2 into s1 swaps insertions and deletions.
+    if len1 < len2:
+        s1, s2, len1, len2, insert_cost, delete_cost = s2, s1, len2, len1, delete_cost, insert_cost
+    if max_distance is not None and (len1 - len2) * delete_cost > max_distance:
+        return max_distance + 1
+    # d0, d1 and d2 are rows i - 2, i - 1 and i, d0 is only needed for transpositions.
+    d0, d1, d2 = None, [j * insert_cost for j in range(len2 + 1)], [0 for _ in range(len2 + 1)]
+    exceeded = max_distance is not None and min(d1) > max_distance
+    for i in range(len1):
+        c1 = s1[i]
+        d2[0] = (i + 1) * delete_cost
+        for j in range(len2):
+            d = min(d1[j] + (0 if c1 == s2[j] else substitute_cost), d1[j + 1] + delete_cost, d2[j] + insert_cost)
+            if transpose_cost is not None and i > 0 and j > 0 and c1 == s2[j - 1] and s1[i - 1] == s2[j] \
+                    and d0[j - 1] + transpose_cost < d:
+                d = d0[j - 1] + transpose_cost
+            d2[j + 1] = d
+        if max_distance is not None:
+            # A cell only depends on the cells of the last two rows (the last row without transpositions).
+            row_exceeded = min(d2) > max_distance
+            if row_exceeded and (exceeded or transpose_cost is None):
+                return max_distance + 1
+            exceeded = row_exceeded
+        d0, d1, d2 = d1, d2, d0 if d0 is not None else [0 for _ in range(len2 + 1)]
+    if max_distance is not None and d1[len2] > max_distance:
+        return max_distance + 1
+    return d1[len2]
+
+
+def __bit_parallel_distance(s1, s2, max_distance, transpositions):
+    """Bit-parallel edit distance for edit_distance_bit_parallel and damerau_distance.
+    """
+    len1, len2 = len(s1), len(s2)
+    if max_distance is not None and abs(len1 - len2) > max_distance:
+        return max_distance + 1
+    if len1 == 0 or len2 == 0:
+        return max(len1, len2)
+    if len1 < len2:
+        s1, s2, len1, len2 = s2, s1, len2, len1
+    # Bit i of peq[c] is set if s2[i] is c.
+    peq = dict()
+    for i, c in enumerate(s2):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    # Bit i of pv (mv) is set if the vertical delta at row i is +1 (-1), bit i of d0 is set if the diagonal delta ending
+    # at row i is 0.
+    mask, last, pv, mv, distance = (1 << len2) - 1, 1 << (len2 - 1), (1 << len2) - 1, 0, len2
+    previous_eq, d0 = 0, 0
+    if max_distance is None:
+        for c in s1:
+            eq = peq.get(c, 0)
+            if transpositions:
+                # A transposition ending at row i is possible if s1[j - 1:j + 1] is s2[i:i - 2:-1], and it is taken
+                # if the diagonal delta ending at row i - 1 in the last column is not 0.
+                d0 = (((eq & pv) + pv) ^ pv) | eq | mv | (((~d0 & eq) << 1) & previous_eq)
+                previous_eq = eq
+            else:
+                d0 = (((eq & pv) + pv) ^ pv) | eq | mv
+            ph = mv | ~(d0 | pv)
+            mh = pv & d0
+            if ph & last:
+                distance += 1
+            elif mh & last:
+                distance -= 1
+            ph = (ph << 1) | 1
+            mh <<= 1
+            pv = (mh | ~(d0 | ph)) & mask
+            mv = ph & d0 & mask
+        return distance
+    # Values never decrease along a diagonal, so the distance is no less than the cell in the current column on the
+    # diagonal ending at the last cell. The cell is tracked from row 0 with the deltas at its row.
+    row, diagonal = -(len1 - len2), len1 - len2
+    for c in s1:
+        eq = peq.get(c, 0)
+        if transpositions:
+            d0 = (((eq & pv) + pv) ^ pv) | eq | mv | (((~d0 & eq) << 1) & previous_eq)
+            previous_eq = eq
+        else:
+            d0 = (((eq & pv) + pv) ^ pv) | eq | mv
+        ph = mv | ~(d0 | pv)
+        mh = pv & d0
+        if ph & last:
+            distance += 1
+        elif mh & last:
+            distance -= 1
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(d0 | ph)) & mask
+        mv = ph & d0 & mask
+        if row >= 0:
+            # Bit row of ph (mh) is the horizontal delta at the row, bit row of pv (mv) is the vertical delta below it.
+            diagonal += ((ph >> row) & 1) - ((mh >> row) & 1) + ((pv >> row) & 1) - ((mv >> row) & 1)
+            if diagonal > max_distance:
+                return max_distance + 1
+        row += 1
+    return min(distance, max_distance + 1)
+
+
+def edit_distance_one_to_many(query, candidates):
+    """Return a list of edit distances between the query and each of the candidates.
+
+    With NumPy, the candidates are encoded as an integer array and the dynamic programming is vectorized across all of
+    them, one row for each char of the query. Otherwise edit_distance is called for each candidate.
+    """
+    candidates = list(candidates)
+    if _numpy() is None:
+        return [edit_distance_bit_parallel(query, candidate) for candidate in candidates]
+    return __edit_distance_vectorized(query, *__encode_candidates(candidates)).tolist()
+
+
+def edit_distance_matrix(a, b, workers=1, tile_size=1000):
+    """Return the matrix of edit distances between each string of a (rows) and each string of b (columns).
+
+    The matrix is split into tiles of at most tile_size x tile_size, which are calculated in a pool of worker processes
+    if workers > 1. The matrix is a NumPy array if NumPy is available, otherwise a list of lists.
+    """
+    a, b = list(a), list(b)
+    tiles = [(a[row:row + tile_size], b[column:column + tile_size], row, column)
+             for row in range(0, len(a), tile_size) for column in range(0, len(b), tile_size)]
+    if _numpy() is None:
+        matrix = [[0 for _ in range(len(b))] for _ in range(len(a))]
+    else:
+        matrix = numpy.zeros((len(a), len(b)), dtype=numpy.int32)
+    if workers <= 1 or len(tiles) <= 1:
+        __fill_matrix(matrix, map(_edit_distance_tile, tiles))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            __fill_matrix(matrix, pool.imap(_edit_distance_tile, tiles))
+    return matrix
+
+
+def __fill_matrix(matrix, tiles):
+    """Copy calculated tiles into the matrix of edit_distance_matrix.
+    """
+    for row, column, tile in tiles:
+        if numpy is None:
+            for i, distances in enumerate(tile):
+                matrix[row + i][column:column + len(distances)] = distances
+        else:
+            matrix[row:row + tile.shape[0], column:column + tile.shape[1]] = tile
+
+
+def __encode_candidates(candidates):
+    """Encode the candidates as a NumPy array for __edit_distance_vectorized, return the codes, the array and lengths.
+
+    Chars are encoded by the order they first appear and the padding after the end of a candidate as -1.
+    """
+    codes, lengths = dict(), numpy.array([len(candidate) for candidate in candidates], dtype=numpy.intp)
+    encoded = numpy.full((len(candidates), int(lengths.max()) if len(candidates) else 0), -1, dtype=numpy.int32)
+    for i, candidate in enumerate(candidates):
+        encoded[i, :len(candidate)] = [codes.setdefault(c, len(codes)) for c in candidate]
+    return codes, encoded, lengths
+
+
+def __edit_distance_vectorized(query, codes, encoded, lengths):
+    """Return a NumPy array of edit distances between the query and each of the encoded candidates.
+    """
+    if len(query) == 0:
+        return lengths.astype(numpy.int32)
+    # Row i of the matrix holds the distances between query[:i] and each prefix of each candidate.
+    count, width = encoded.shape
+    offsets = numpy.arange(width + 1, dtype=numpy.int32)
+    d0, d1 = numpy.tile(offsets, (count, 1)), numpy.empty((count, width + 1), dtype=numpy.int32)
+    for i, c in enumerate(query):
+        # Substitution and deletion only depend on the previous row. A char not in any candidate is encoded as -2 so
+        # that it is equal to nothing, including the padding.
+        d1[:, 0] = i + 1
+        numpy.minimum(d0[:, :-1] + (encoded != codes.get(c, -2)), d0[:, 1:] + 1, out=d1[:, 1:])
+        # Insertion is d1[j] = min(d1[j], d1[j - 1] + 1), i.e. d1[j] - j is the running minimum of d1[k] - k, k <= j.
+        d1 -= offsets
+        numpy.minimum.accumulate(d1, axis=1, out=d1)
+        d1 += offsets
+        d0, d1 = d1, d0
+    return d0[numpy.arange(count), lengths]
+
+
+def _edit_distance_tile(tile):
+    """Calculate a tile of edit_distance_matrix, in process or in a worker process.
+    """
+    a, b, row, column = tile
+    if _numpy() is None:
+        return row, column, [[edit_distance_bit_parallel(s1, s2) for s2 in b] for s1 in a]
+    result, encoded_b = numpy.empty((len(a), len(b)), dtype=numpy.int32), __encode_candidates(b)
+    for i, s1 in enumerate(a):
+        result[i] = __edit_distance_vectorized(s1, *encoded_b)
+    return row, column, result
+
+
+#
+# BK-tree.
+#
+
+class BKTree:
+    """Burkhard-Keller tree for looking up strings by edit distance.
+
+    Each node keeps a string and its children keyed by their edit distance to it. If the query is at distance d from a
+    node, the triangle inequality rules out every child whose key is out of [d - max_distance, d + max_distance], so
+    a query only visits a small part of the tree when max_distance is small.
+    """
+
+    def __init__(self, strings=()):
+        """Initialize with strings.
+        """
+        # A node is (string, {distance: child node}).
+        self.root, self.size = None, 0
+        for string in strings:
+            self.add(string)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, string):
+        """Add a string, duplicated strings are ignored.
+        """
+        if self.root is None:
+            self.root, self.size = (string, dict()), 1
+            return
+        node = self.root
+        while True:
+            distance = edit_distance(string, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (string, dict())
+                self.size += 1
+                return
+            node = child
+
+    def search(self, query, max_distance):
+        """Return [(distance, string)] of the strings within max_distance from the query, sorted by distance.
+        """
+        results, nodes = list(), [self.root] if self.root is not None else []
+        while nodes:
+            string, children = nodes.pop()
+            # Children are only needed if the distance is no greater than max_distance plus the greatest key.
+            cutoff = max_distance + (max(children) if children else 0)
+            distance = edit_distance(query, string, cutoff)
+            if distance <= max_distance:
+                results.append((distance, string))
+            for key, child in children.items():
+                if distance - max_distance <= key <= distance + max_distance:
+                    nodes.append(child)
+        results.sort()
+        return results
+
+    def nearest(self, query, k=1):
+        """Return [(distance, string)] of the k strings nearest to the query, sorted by distance.
+        """
+        if k <= 0:
+            return []
+        # Nodes are visited in the order of their lower bounds, and the k nearest strings are kept in a max heap.
+        nearest, nodes, counter = list(), [(0, 0, self.root)] if self.root is not None else [], 1
+        while nodes:
+            bound, _, (string, children) = heapq.heappop(nodes)
+            if len(nearest) == k and bound >= -nearest[0][0]:
+                break
+            if len(nearest) < k:
+                distance = edit_distance(query, string)
+            else:
+                # Neither the string nor any child is needed if the distance reaches the k-th nearest distance plus
+                # the greatest key.
+                distance = edit_distance(query, string, -nearest[0][0] - 1 + (max(children) if children else 0))
+            if len(nearest) < k:
+                heapq.heappush(nearest, (-distance, string))
+            elif distance < -nearest[0][0]:
+                heapq.heapreplace(nearest, (-distance, string))
+            for key, child in children.items():
+                bound = abs(distance - key)
+                if len(nearest) < k or bound < -nearest[0][0]:
+                    heapq.heappush(nodes, (bound, counter, child))
+                    counter += 1
+        return sorted((-distance, string) for distance, string in nearest)